@@ -0,0 +1,122 @@
+"""Benchmarks how long BSAG takes to load the `jh61b` plugin and the steps a config uses, and reports it as JSON.
+
+Each repetition starts a fresh interpreter that imports the plugin, loads its step definitions and looks up the config
+type of each of `--steps` the way BSAG does, from the type each step definition is parameterized with. `--eager` looks
+up every step. With `--budget-ms`, exits with status 1 if the median exceeds the budget.
+
+After timing, each interpreter also imports the steps and checks that they take the config types BSAG found. With
+`--config`, the steps are the `jh61b` steps of that autograder config, and their configs are parsed with those types.
+
+    python benchmarks/bench_import.py --steps check_files compilation --repeat 20 --budget-ms 150
+    python benchmarks/bench_import.py --config autograder.yml
+"""
+
+import argparse
+import json
+import platform
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+CHILD = """
+import json, sys, time
+from pathlib import Path
+from typing import get_args
+start = time.perf_counter()
+from bsag_jh61b._plugin import bsag_load_step_defs
+steps = {step.name(): step for step in bsag_load_step_defs()}
+names = json.loads(sys.argv[1]) or list(steps)
+config_types = {name: get_args(steps[name].__orig_bases__[0])[0] for name in names}
+elapsed = time.perf_counter() - start
+modules = sorted(m for m in sys.modules if m.startswith("bsag_jh61b"))
+
+from bsag_jh61b._registry import LazyStep
+from bsag_jh61b.batch import load_steps
+try:
+    for name in names:
+        if issubclass(steps[name], LazyStep):
+            steps[name].load()
+    for name, values in load_steps(Path(sys.argv[2])) if len(sys.argv) > 2 else []:
+        if name in config_types:
+            config_types[name].parse_obj(values)
+except Exception as e:
+    print(json.dumps({"error": f"{name}: {e}"}))
+    sys.exit()
+print(json.dumps({"seconds": elapsed, "modules": modules}))
+"""
+IMPORTTIME_PAT = re.compile(r"^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \|(?P<indent>\s+)(?P<module>\S+)$")
+
+
+def run_once(steps: list[str], config: Path | None) -> tuple[dict[str, object], dict[str, int]]:
+    """Times one fresh interpreter. Returns its report and the microseconds spent importing each top-level package."""
+    args = [sys.executable, "-X", "importtime", "-c", CHILD, json.dumps(steps)]
+    if config is not None:
+        args.append(str(config.absolute()))
+    proc = subprocess.run(args, capture_output=True, text=True, check=True, cwd=Path(__file__).parent.parent)
+    packages: dict[str, int] = defaultdict(int)
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_PAT.match(line)
+        if match:
+            packages[match.group("module").split(".")[0]] += int(match.group("self"))
+    return json.loads(proc.stdout.splitlines()[-1]), packages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", nargs="*", default=["check_files", "compilation"], help="steps the config uses")
+    parser.add_argument("--eager", action="store_true", help="resolve every step")
+    parser.add_argument("--config", type=Path, help="an autograder config whose steps to load and configs to parse")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10, help="report the packages that take longest to import")
+    parser.add_argument("--budget-ms", type=float, help="fail if the median load time exceeds this")
+    parser.add_argument("--output", type=Path, help="write the report here instead of stdout")
+    args = parser.parse_args()
+
+    if args.config is not None:
+        from bsag_jh61b.batch import load_steps
+
+        args.steps = [name.removeprefix("jh61b.") for name, _ in load_steps(args.config) if name.startswith("jh61b.")]
+    steps = [] if args.eager else [f"jh61b.{step}" for step in args.steps]
+    samples: list[float] = []
+    package_us: dict[str, list[int]] = defaultdict(list)
+    modules: list[str] = []
+    for _ in range(args.repeat):
+        report, packages = run_once(steps, args.config)
+        if "error" in report:
+            sys.exit(f"Unable to load the steps as BSAG does: {report['error']}")
+        samples.append(float(report["seconds"]))  # type: ignore
+        modules = report["modules"]  # type: ignore
+        for package, us in packages.items():
+            package_us[package].append(us)
+
+    median_ms = statistics.median(samples) * 1000
+    slowest = sorted(package_us, key=lambda p: statistics.median(package_us[p]), reverse=True)[: args.top]
+    result = {
+        "steps": "all" if args.eager else args.steps,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "load_ms": {
+            "min": min(samples) * 1000,
+            "p50": median_ms,
+            "max": max(samples) * 1000,
+        },
+        "budget_ms": args.budget_ms,
+        "jh61b_modules": modules,
+        "slowest_packages_ms": {package: statistics.median(package_us[package]) / 1000 for package in slowest},
+    }
+    text = json.dumps(result, indent=2)
+    if args.output is not None:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.budget_ms is not None and median_ms > args.budget_ms:
+        sys.exit(f"Median load time {median_ms:.1f} ms exceeds the budget of {args.budget_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""Benchmarks the `jh61b` steps against generated pieces and submissions, and reports the results as JSON.
+
+Each repetition generates a fresh grader and submission tree, then runs `check_files`, `compilation`, `dep_check`,
+`checkstyle`, `assessment` and `final_score` on it in order, timing each step's `run`. With `--scratch`, `scratch` runs
+first, so classes and results are written to a RAM-backed workspace.
+
+`javac` and `jdeps` are real when a JDK is on the `PATH` (or with `--jdk real`). The assessment runner and checkstyle
+need their jars, so `java` is always stubbed, as is everything with `--jdk stub`. Stubbed commands return generated
+output straight away (after `--stub-latency`), so a stubbed run measures the steps' own overhead.
+
+    python benchmarks/bench_steps.py --files 200 --classes 50 --tests 100 --output bench.json
+"""
+
+import argparse
+import json
+import platform
+import re
+import shutil
+import statistics
+import struct
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Sequence
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, NamedTuple, cast
+
+from bsag.bsagio import BSAGIO
+from bsag.steps.gradescope import METADATA_KEY, RESULTS_KEY, Results, SubmissionMetadata, TestResult
+from bsag.utils import subprocesses
+
+from bsag_jh61b._buffered_io import BufferedBSAGIO
+from bsag_jh61b._registry import step_config_type, step_definitions
+from bsag_jh61b.java_utils import class_file_name
+from bsag_jh61b.scratch import scratch_workspace
+
+STEPS = ["scratch", "check_files", "compilation", "dep_check", "checkstyle", "assessment", "final_score"]
+JDEPS_TARGETS = ["java.util.ArrayList", "java.util.HashMap", "java.lang.String", "java.lang.reflect.Method"]
+CHECKSTYLE_XML = '<?xml version="1.0"?>\n<module name="Checker"/>\n'
+PACKAGE_PAT = re.compile(r"^package\s+(?P<package>[\w.]+);", re.MULTILINE)
+
+
+class BenchParams(NamedTuple):
+    pieces: int
+    files: int
+    classes: int
+    tests: int
+    jdeps_deps: int
+    test_output_bytes: int
+    stub_latency: float
+
+
+class SubprocessResult(NamedTuple):
+    output: str
+    stderr: str
+    return_code: int
+    timed_out: bool
+
+
+def _utf8_constant(value: str) -> bytes:
+    encoded = value.encode()
+    return struct.pack(">BH", 1, len(encoded)) + encoded
+
+
+def _class_file(name: str, source_file: str) -> bytes:
+    """A minimal class file that only defines `name` and its `SourceFile` attribute (enough for `java_utils`)."""
+    constants = (
+        _utf8_constant(name.replace(".", "/"))
+        + struct.pack(">BH", 7, 1)
+        + _utf8_constant("SourceFile")
+        + _utf8_constant(source_file)
+    )
+    header = struct.pack(">IHHH", 0xCAFEBABE, 0, 52, 5)
+    # Access flags, this class, super class, then no interfaces, fields or methods, and the one class attribute.
+    body = struct.pack(">HHHHHHH", 0x21, 2, 0, 0, 0, 0, 1) + struct.pack(">HIH", 3, 2, 4)
+    return header + constants + body
+
+
+class StubSubprocesses:
+    """Stands in for `bsag.utils.subprocesses.run_subprocess`, generating the output each tool would produce."""
+
+    def __init__(self, params: BenchParams, real_tools: set[str], real: Callable[..., Any]) -> None:
+        self.params = params
+        self.real_tools = real_tools
+        self.real = real
+
+    def __call__(self, args: Sequence[str | Path], cwd: Path | None = None, timeout: int | None = None) -> Any:
+        argv = [str(arg) for arg in args]
+        tool = Path(argv[0]).name
+        if tool in self.real_tools:
+            return self.real(args, cwd=cwd, timeout=timeout)
+
+        time.sleep(self.params.stub_latency)
+        if tool == "javac":
+            return self._javac(argv)
+        if tool == "jdeps":
+            return self._jdeps(argv)
+        if "-version" in argv:
+            return SubprocessResult("", 'openjdk version "17.0.8"', 0, False)
+        if "--outfile" in argv or "--outdir" in argv:
+            return self._assessment(argv)
+        return SubprocessResult("Starting audit...\nAudit done.\n", "", 0, False)
+
+    def _javac(self, argv: list[str]) -> SubprocessResult:
+        class_dir = Path(argv[argv.index("-d") + 1]) if "-d" in argv else None
+        for source in (Path(arg) for arg in argv if arg.endswith(".java")):
+            match = PACKAGE_PAT.search(source.read_text(encoding="utf-8"))
+            name = f"{match.group('package')}.{source.stem}" if match else source.stem
+            if class_dir is not None:
+                class_file = Path(class_dir, *name.split(".")).with_suffix(".class")
+                class_file.parent.mkdir(parents=True, exist_ok=True)
+            else:
+                class_file = source.with_suffix(".class")
+            class_file.write_bytes(_class_file(name, source.name))
+        return SubprocessResult("", "", 0, False)
+
+    def _jdeps(self, argv: list[str]) -> SubprocessResult:
+        lines = []
+        for target in (Path(arg) for arg in argv if arg.endswith(".class")):
+            name = class_file_name(target)
+            for i in range(self.params.jdeps_deps):
+                lines.append(f"   {name} -> {JDEPS_TARGETS[i % len(JDEPS_TARGETS)]}   java.base")
+        return SubprocessResult("\n".join(lines), "", 0, False)
+
+    def _assessment(self, argv: list[str]) -> SubprocessResult:
+        def results(assessment_class: str) -> Results:
+            output = "x" * self.params.test_output_bytes
+            tests = [
+                TestResult(name=f"{assessment_class}.test{i}", score=1, max_score=1, output=output)
+                for i in range(self.params.tests)
+            ]
+            return Results(tests=tests)
+
+        if "--outdir" in argv:
+            outdir = argv[argv.index("--outdir") + 1]
+            for assessment_class in argv[argv.index("--") + 1 :]:
+                Path(outdir, f"{assessment_class}.json").write_text(results(assessment_class).json(), encoding="utf-8")
+            return SubprocessResult("", "", 0, False)
+
+        assessment_class = argv[argv.index("--secure") - 1]
+        outfile = Path(argv[argv.index("--outfile") + 1])
+        if "--ndjson" in argv:
+            tests = results(assessment_class).tests
+            header = {"expected_tests": len(tests), "expected_max_score": sum(test.max_score or 0 for test in tests)}
+            lines = [json.dumps(header), *(test.json() for test in tests), json.dumps({"test_count": len(tests)})]
+            outfile.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+        else:
+            outfile.write_text(results(assessment_class).json(), encoding="utf-8")
+        return SubprocessResult("", "", 0, False)
+
+
+def generate(root: Path, params: BenchParams) -> dict[str, dict[str, list[str]]]:
+    """Writes a grader and submission tree under `root`. Returns the pieces for `jh61b.check_files`."""
+    pieces: dict[str, dict[str, list[str]]] = {
+        f"Piece{p}": {"student_files": [], "assessment_files": []} for p in range(params.pieces)
+    }
+    for i in range(params.files):
+        piece = f"Piece{i % params.pieces}"
+        source = Path(root, "submission", f"pkg{i % params.pieces}", f"Student{i}.java")
+        source.parent.mkdir(parents=True, exist_ok=True)
+        source.write_text(
+            f"package pkg{i % params.pieces};\n\npublic class Student{i} {{\n"
+            f"    public static int value(int x) {{\n        return x + {i};\n    }}\n}}\n",
+            encoding="utf-8",
+        )
+        pieces[piece]["student_files"].append(str(source.relative_to(Path(root, "submission"))))
+
+    for j in range(params.classes):
+        p = j % params.pieces
+        students = pieces[f"Piece{p}"]["student_files"]
+        student_class = Path(students[j % len(students)]).stem if students else None
+        body = f"        System.out.println(pkg{p}.{student_class}.value({j}));\n" if student_class else ""
+        test = Path(root, "grader", f"AGTest{j}.java")
+        test.parent.mkdir(parents=True, exist_ok=True)
+        test.write_text(
+            f"public class AGTest{j} {{\n    public static void main(String[] args) {{\n{body}    }}\n}}\n",
+            encoding="utf-8",
+        )
+        pieces[f"Piece{p}"]["assessment_files"].append(test.name)
+
+    Path(root, "checkstyle.xml").write_text(CHECKSTYLE_XML, encoding="utf-8")
+    return pieces
+
+
+def step_configs(root: Path, pieces: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    roots = {"grader_root": str(Path(root, "grader")), "submission_root": str(Path(root, "submission"))}
+    return {
+        "check_files": {**roots, "pieces": pieces},
+        "compilation": {**roots},
+        "dep_check": {**roots, "disallowed_classes": ["java.lang.reflect.**"]},
+        "checkstyle": {
+            "checkstyle_jar_path": None,
+            "checkstyle_xml_path": str(Path(root, "checkstyle.xml")),
+            "submission_root": roots["submission_root"],
+            "command_timeout": 60,
+        },
+        "assessment": {**roots},
+        "scratch": {},
+        "final_score": {"max_points": 100, "scoring": dict.fromkeys(pieces, 1)},
+    }
+
+
+def step_items(step: str, params: BenchParams) -> int:
+    """The unit of work each step's throughput is reported in."""
+    if step == "assessment":
+        return params.classes * params.tests
+    if step == "dep_check":
+        return params.files * params.jdeps_deps
+    if step == "final_score":
+        return params.pieces
+    return params.files
+
+
+def run_once(params: BenchParams, steps: list[str]) -> dict[str, float]:
+    definitions = step_definitions()
+    timings: dict[str, float] = {}
+    with tempfile.TemporaryDirectory(prefix="jh61b-bench") as workdir:
+        root = Path(workdir)
+        configs = step_configs(root, generate(root, params))
+
+        bsagio = BufferedBSAGIO({}, [])
+        bsagio.data[RESULTS_KEY] = Results(tests=[])
+        bsagio.data[METADATA_KEY] = SubmissionMetadata.construct(users=[], created_at=datetime.now(timezone.utc))
+        for step_name in steps:
+            step = definitions[f"jh61b.{step_name}"]
+            config = step_config_type(step).parse_obj(configs[step_name])
+            start = time.perf_counter()
+            succeeded = step.run(bsagio, config)  # type: ignore
+            timings[step_name] = time.perf_counter() - start
+            if not succeeded:
+                errors = [record.message for record in bsagio.records if record.level == "error"]
+                sys.exit(f"Step {step_name} failed, so its timings would be meaningless:\n" + "\n".join(errors))
+
+        workspace = scratch_workspace(cast(BSAGIO, bsagio))
+        if workspace is not None:
+            workspace.cleanup()
+    return timings
+
+
+def summarize(samples: list[float], items: int) -> dict[str, float]:
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)]
+
+    median = statistics.median(ordered)
+    return {
+        "min": ordered[0],
+        "p50": median,
+        "p90": pct(90),
+        "p99": pct(99),
+        "max": ordered[-1],
+        "mean": statistics.fmean(ordered),
+        "items": items,
+        "items_per_second": items / median if median > 0 else float("inf"),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pieces", type=int, default=4)
+    parser.add_argument("--files", type=int, default=100, help="student files")
+    parser.add_argument("--classes", type=int, default=20, help="assessment classes")
+    parser.add_argument("--tests", type=int, default=50, help="tests per assessment class")
+    parser.add_argument("--jdeps-deps", type=int, default=20, help="stubbed jdeps dependencies per class")
+    parser.add_argument("--test-output-bytes", type=int, default=200)
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="seconds each stubbed command takes")
+    parser.add_argument("--jdk", choices=["auto", "real", "stub"], default="auto")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--steps", nargs="+", choices=STEPS, default=STEPS[1:])
+    parser.add_argument("--scratch", action="store_true", help="run the scratch step first")
+    parser.add_argument("--output", type=Path, help="write the report here instead of stdout")
+    args = parser.parse_args()
+
+    params = BenchParams(
+        args.pieces,
+        args.files,
+        args.classes,
+        args.tests,
+        args.jdeps_deps,
+        args.test_output_bytes,
+        args.stub_latency,
+    )
+    real_tools = {tool for tool in ["javac", "jdeps"] if args.jdk != "stub" and shutil.which(tool)}
+    if args.jdk == "real" and len(real_tools) < 2:
+        sys.exit("--jdk real needs javac and jdeps on the PATH")
+    subprocesses.run_subprocess = StubSubprocesses(params, real_tools, subprocesses.run_subprocess)  # type: ignore
+
+    steps = ["scratch", *args.steps] if args.scratch and "scratch" not in args.steps else args.steps
+    samples: dict[str, list[float]] = {step: [] for step in steps}
+    for _ in range(args.repeat):
+        for step, seconds in run_once(params, steps).items():
+            samples[step].append(seconds)
+
+    report = {
+        "params": params._asdict(),
+        "repeat": args.repeat,
+        "real_tools": sorted(real_tools),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "steps": {step: summarize(times, step_items(step, params)) for step, times in samples.items()},
+    }
+    text = json.dumps(report, indent=2)
+    if args.output is not None:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.nio.file.Path;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.List;
+
+/**
+ * Runs several assessment classes in a single JVM, by calling each one's {@code main} in turn.
+ *
+ * <p>See {@code _batch_runner.py}. The arguments are those of a single assessment class, with {@code --outdir DIR}
+ * in place of {@code --outfile FILE}, then {@code --} and the classes to run. Each class is given
+ * {@code --outfile DIR/<class>.json}. The runner stops at the first class that throws, and the grader reruns that class
+ * and the ones after it in their own JVMs.
+ */
+public class BatchRunner {
+    public static void main(String[] args) throws ReflectiveOperationException {
+        List<String> classArgs = new ArrayList<>();
+        int outfileIndex = -1;
+        String outdir = null;
+        int i = 0;
+        for (; i < args.length && !args[i].equals("--"); i++) {
+            if (args[i].equals("--outdir") && i + 1 < args.length) {
+                outfileIndex = classArgs.size();
+                outdir = args[++i];
+            } else {
+                classArgs.add(args[i]);
+            }
+        }
+        if (outdir == null || i == args.length) {
+            System.err.println("Usage: BatchRunner [ARG...] --outdir DIR [ARG...] -- CLASS...");
+            System.exit(2);
+        }
+
+        for (String className : Arrays.copyOfRange(args, i + 1, args.length)) {
+            List<String> mainArgs = new ArrayList<>(classArgs);
+            mainArgs.addAll(outfileIndex, List.of("--outfile", Path.of(outdir, className + ".json").toString()));
+            Method main = Class.forName(className).getMethod("main", String[].class);
+            try {
+                main.invoke(null, (Object) mainArgs.toArray(new String[0]));
+            } catch (InvocationTargetException e) {
+                e.getCause().printStackTrace();
+                System.exit(1);
+            }
+        }
+    }
+}
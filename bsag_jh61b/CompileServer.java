@@ -0,0 +1,55 @@
+import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.nio.charset.StandardCharsets;
+
+import javax.tools.JavaCompiler;
+import javax.tools.ToolProvider;
+
+/**
+ * Runs javac command lines read from stdin in a single, long-lived JVM.
+ *
+ * <p>See {@code _compile_server.py} for the protocol. A request is the number of arguments on one line followed by
+ * one argument per line. The response is the exit status on one line, the number of output lines on the next, and
+ * then the output itself.
+ */
+public class CompileServer {
+    public static void main(String[] args) throws IOException {
+        PrintStream out = new PrintStream(System.out, true, StandardCharsets.UTF_8);
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+        if (compiler == null) {
+            out.println("no compiler");
+            System.exit(1);
+        }
+        out.println("ready");
+
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        String line;
+        while ((line = in.readLine()) != null) {
+            String[] javacArgs = new String[Integer.parseInt(line.trim())];
+            for (int i = 0; i < javacArgs.length; i++) {
+                javacArgs[i] = in.readLine();
+            }
+
+            ByteArrayOutputStream diagnostics = new ByteArrayOutputStream();
+            int status;
+            try {
+                status = compiler.run(null, diagnostics, diagnostics, javacArgs);
+            } catch (RuntimeException e) {
+                e.printStackTrace(new PrintStream(diagnostics, true, StandardCharsets.UTF_8));
+                status = 4;
+            }
+
+            String output = diagnostics.toString(StandardCharsets.UTF_8).stripTrailing();
+            String[] lines = output.isEmpty() ? new String[0] : output.split("\r?\n", -1);
+            out.println(status);
+            out.println(lines.length);
+            for (String outputLine : lines) {
+                out.println(outputLine);
+            }
+            out.flush();
+        }
+    }
+}
@@ -1,4 +1,14 @@
-from ._types import PIECES_KEY, TEST_RESULTS_KEY, AssessmentPieces, BaseJh61bConfig, FailedPiece, Jh61bResults, Piece
+from ._types import (
+    PIECES_KEY,
+    STEP_LOGS_KEY,
+    TEST_RESULTS_KEY,
+    AssessmentPieces,
+    BaseJh61bConfig,
+    FailedPiece,
+    Jh61bResults,
+    Piece,
+    StepLog,
+)
 
 __all__ = [
     "AssessmentPieces",
@@ -6,6 +16,8 @@ __all__ = [
     "FailedPiece",
     "Piece",
     "PIECES_KEY",
+    "StepLog",
+    "STEP_LOGS_KEY",
     "TEST_RESULTS_KEY",
     "Jh61bResults",
 ]
@@ -0,0 +1,24 @@
+import tempfile
+from pathlib import Path
+
+from bsag.bsagio import BSAGIO
+
+from ._timing import run_subprocess
+
+BATCH_RUNNER_KEY = "jh61b_batch_runner"
+BATCH_RUNNER_CLASS = "BatchRunner"
+RUNNER_SOURCE = Path(__file__).with_name("BatchRunner.java")
+
+
+def batch_runner_dir(bsagio: BSAGIO) -> Path | None:
+    """The directory with the bundled `BatchRunner` class, compiled once per grading run. `None` if it won't compile."""
+    if BATCH_RUNNER_KEY not in bsagio.data:
+        class_dir = tempfile.TemporaryDirectory(prefix="jh61b-batch-runner")
+        build = run_subprocess(["javac", "-d", class_dir.name, RUNNER_SOURCE], label="javac (batch runner)")
+        if build.return_code != 0:
+            bsagio.private.warning(f"Unable to build the batch runner; running classes separately:\n{build.output}")
+            class_dir.cleanup()
+        bsagio.data[BATCH_RUNNER_KEY] = class_dir if build.return_code == 0 else None
+
+    built: tempfile.TemporaryDirectory[str] | None = bsagio.data[BATCH_RUNNER_KEY]
+    return Path(built.name) if built is not None else None
@@ -0,0 +1,59 @@
+from typing import Any, NamedTuple
+
+from bsag.bsagio import BSAGIO
+
+
+class LogRecord(NamedTuple):
+    channel: str
+    level: str
+    message: str
+
+
+class BufferedLogger:
+    def __init__(self, records: list[LogRecord], channel: str) -> None:
+        self._records = records
+        self._channel = channel
+
+    def _log(self, level: str, message: str) -> None:
+        self._records.append(LogRecord(self._channel, level, message))
+
+    def trace(self, message: str) -> None:
+        self._log("trace", message)
+
+    def debug(self, message: str) -> None:
+        self._log("debug", message)
+
+    def info(self, message: str) -> None:
+        self._log("info", message)
+
+    def success(self, message: str) -> None:
+        self._log("success", message)
+
+    def warning(self, message: str) -> None:
+        self._log("warning", message)
+
+    def error(self, message: str) -> None:
+        self._log("error", message)
+
+
+class BufferedIO:
+    """Collects `BSAGIO`-style log calls so work done off the main thread can be replayed in a fixed order."""
+
+    def __init__(self) -> None:
+        self.records: list[LogRecord] = []
+        self.student = BufferedLogger(self.records, "student")
+        self.private = BufferedLogger(self.records, "private")
+        self.both = BufferedLogger(self.records, "both")
+
+    def replay(self, bsagio: BSAGIO) -> None:
+        for record in self.records:
+            getattr(getattr(bsagio, record.channel), record.level)(record.message)
+
+
+class BufferedBSAGIO(BufferedIO):
+    """A `BufferedIO` that can stand in for a `BSAGIO` when running a step definition directly."""
+
+    def __init__(self, data: dict[str, Any], step_logs: list[Any]) -> None:
+        super().__init__()
+        self.data = data
+        self.step_logs = step_logs
@@ -0,0 +1,94 @@
+"""Shortens output shown to students. Runs of identical lines and javac diagnostics with the same message are collapsed,
+then output that is still too long is cut in the middle, keeping its start and end.
+"""
+
+import re
+from itertools import groupby
+
+# Runs of identical lines longer than this are collapsed.
+MAX_REPEATS = 3
+# javac diagnostics with the same file and message after the first few are collapsed.
+MAX_IDENTICAL_DIAGNOSTICS = 3
+# The share of a limit kept from the end of the output, where stack traces and summaries are.
+TAIL_FRACTION = 0.25
+
+REPEATED_MSG = "... ({} more identical lines)"
+TRUNCATED_MSG = "\n... ({} characters omitted) ...\n"
+MORE_DIAGNOSTICS_MSG = '... {count} more "{message}" {kind}s in {file}'
+DIAGNOSTIC_PAT = re.compile(r"^(?P<file>.+\.java):\d+: (?P<kind>error|warning): (?P<message>.*)$")
+DIAGNOSTIC_COUNT_PAT = re.compile(r"^\d+ (error|warning)s?$")
+
+
+def collapse_repeats(text: str, max_repeats: int = MAX_REPEATS) -> str:
+    lines: list[str] = []
+    for line, run in groupby(text.splitlines()):
+        count = sum(1 for _ in run)
+        lines.extend([line] * min(count, max_repeats))
+        if count > max_repeats:
+            lines.append(REPEATED_MSG.format(count - max_repeats))
+    return "\n".join(lines)
+
+
+def collapse_diagnostics(output: str, max_identical: int = MAX_IDENTICAL_DIAGNOSTICS) -> str:
+    """Drops javac diagnostics (with their source excerpts) after the first `max_identical` with the same file and
+    message, and lists how many were dropped at the end.
+    """
+    blocks: list[tuple[tuple[str, str, str] | None, list[str]]] = []
+    for line in output.splitlines():
+        match = DIAGNOSTIC_PAT.match(line)
+        if match is not None:
+            blocks.append(((match.group("file"), match.group("kind"), match.group("message")), [line]))
+        elif DIAGNOSTIC_COUNT_PAT.match(line) or not blocks:
+            blocks.append((None, [line]))
+        else:
+            blocks[-1][1].append(line)
+
+    seen: dict[tuple[str, str, str], int] = {}
+    lines: list[str] = []
+    for key, block in blocks:
+        if key is not None:
+            seen[key] = seen.get(key, 0) + 1
+            if seen[key] > max_identical:
+                continue
+        lines.extend(block)
+    for (file, kind, message), count in seen.items():
+        if count > max_identical:
+            lines.append(
+                MORE_DIAGNOSTICS_MSG.format(count=count - max_identical, message=message, kind=kind, file=file)
+            )
+    return "\n".join(lines)
+
+
+def truncate_middle(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    # The marker counts towards the limit, unless the limit is shorter than it.
+    keep = max(max_chars - len(TRUNCATED_MSG.format(len(text))), 0)
+    tail = int(keep * TAIL_FRACTION)
+    head = keep - tail
+    return text[:head] + TRUNCATED_MSG.format(len(text) - keep) + (text[-tail:] if tail else "")
+
+
+def compact_output(text: str, max_chars: int) -> str:
+    """Collapses repeated lines in `text`, then cuts it to about `max_chars` characters."""
+    return truncate_middle(collapse_repeats(text), max_chars)
+
+
+def compact_javac_output(output: str, max_chars: int) -> str:
+    """`compact_output` for javac output, which also collapses repeated diagnostics."""
+    return compact_output(collapse_diagnostics(output), max_chars)
+
+
+def output_budgets(lengths: list[int], max_total: int) -> list[int]:
+    """Shares `max_total` characters between outputs of the given lengths. Outputs shorter than an equal share are kept
+    whole, and the longer ones split what they leave.
+    """
+    if sum(lengths) <= max_total:
+        return list(lengths)
+    budgets = list(lengths)
+    remaining = max_total
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    for done, i in enumerate(order):
+        budgets[i] = min(lengths[i], remaining // (len(order) - done))
+        remaining -= budgets[i]
+    return budgets
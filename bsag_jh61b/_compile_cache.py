@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Sequence
+from pathlib import Path
+
+from .java_utils import source_api
+
+
+class CompileCache:
+    """Content-addressed cache of the class files produced by compiling the grader's sources.
+
+    An entry is keyed by the hash of every `.java` file under the grader root, the API (`source_api`) of every `.java`
+    file under `api_root`, the javac flags, and the javac executable. It maps to the `.class` files javac compiled from
+    the grader's sources into `class_root` (by default, next to them). Class files are stored once per content hash, so
+    a cache directory baked into the autograder image can be shared by many assignments.
+
+    Grader classes compiled against the submission (such as assessment classes) depend on more than its API, so
+    callers should still pass them to javac; the cache saves compiling the grader classes they use.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        source_root: Path,
+        flags: Sequence[str | Path],
+        class_root: Path | None = None,
+        api_root: Path | None = None,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.source_root = source_root
+        self.class_root = class_root if class_root is not None else source_root
+        self.api_root = api_root
+        self.key = self._tree_key(flags)
+
+    def _tree_key(self, flags: Sequence[str | Path]) -> str:
+        tree_hash = hashlib.sha256()
+        javac = shutil.which("javac")
+        if javac is not None:
+            javac_path = Path(javac).resolve()
+            tree_hash.update(f"{javac_path}:{javac_path.stat().st_mtime_ns}\0".encode())
+        for flag in flags:
+            tree_hash.update(f"{flag}\0".encode())
+        for source in sorted(self.source_root.rglob("*.java")):
+            tree_hash.update(f"{source.relative_to(self.source_root)}\0".encode())
+            tree_hash.update(hashlib.sha256(source.read_bytes()).digest())
+        if self.api_root is not None:
+            tree_hash.update(b"api\0")
+            for source in sorted(self.api_root.rglob("*.java")):
+                api = source_api(source.read_text(encoding="utf-8", errors="replace"))
+                tree_hash.update(f"{source.relative_to(self.api_root)}\0".encode())
+                tree_hash.update(hashlib.sha256(api.encode()).digest())
+        return tree_hash.hexdigest()
+
+    def _manifest_path(self) -> Path:
+        return Path(self.cache_dir, "trees", f"{self.key}.json")
+
+    def _blob_path(self, blob: str) -> Path:
+        return Path(self.cache_dir, "blobs", blob[:2], blob)
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def restore(self) -> bool:
+        """Copies the cached class files into the class root. Returns whether there was a complete entry."""
+        manifest_path = self._manifest_path()
+        if not manifest_path.is_file():
+            return False
+        with open(manifest_path, encoding="utf-8") as f:
+            entries: dict[str, str] = json.load(f)
+        if not all(self._blob_path(blob).is_file() for blob in entries.values()):
+            return False
+
+        # Copies get a fresh mtime, so javac prefers them over the (older) sources.
+        for class_file, blob in entries.items():
+            dest = Path(self.class_root, class_file)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(self._blob_path(blob), dest)
+        return True
+
+    def store(self) -> None:
+        """Records every class file under the class root that was compiled from a grader source."""
+        entries: dict[str, str] = {}
+        for class_file in self.class_root.rglob("*.class"):
+            relative = class_file.relative_to(self.class_root)
+            # Nested and anonymous classes are compiled to `Outer$Inner.class`.
+            if not Path(self.source_root, relative.parent, relative.stem.split("$")[0] + ".java").is_file():
+                continue
+            data = class_file.read_bytes()
+            blob = hashlib.sha256(data).hexdigest()
+            if not self._blob_path(blob).is_file():
+                self._write_atomic(self._blob_path(blob), data)
+            entries[str(relative)] = blob
+
+        self._write_atomic(self._manifest_path(), json.dumps(entries, sort_keys=True).encode())
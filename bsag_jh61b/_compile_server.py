@@ -0,0 +1,171 @@
+import atexit
+import queue
+import subprocess
+import tempfile
+import threading
+import time
+from collections.abc import Sequence
+from pathlib import Path
+from subprocess import list2cmdline
+from typing import IO, NamedTuple, Protocol
+
+from bsag.bsagio import BSAGIO
+
+from ._timing import SubprocessTiming, record, run_subprocess
+
+COMPILE_SERVER_KEY = "jh61b_compile_server"
+SERVER_SOURCE = Path(__file__).with_name("CompileServer.java")
+STARTUP_TIMEOUT = 60
+
+
+class JavacResult(Protocol):
+    @property
+    def output(self) -> str: ...
+
+    @property
+    def return_code(self) -> int: ...
+
+    @property
+    def timed_out(self) -> bool: ...
+
+
+class CompileResult(NamedTuple):
+    output: str
+    stderr: str
+    return_code: int
+    timed_out: bool
+
+
+class CompileServer:
+    """A warm JVM running `javax.tools.JavaCompiler`, shared by every step in a grading run.
+
+    Each `compile` sends one javac command line over the server's stdin and waits for the status and diagnostics on its
+    stdout, so only the first compilation pays for JVM startup.
+    """
+
+    def __init__(self) -> None:
+        self._class_dir = tempfile.TemporaryDirectory(prefix="jh61b-compile-server")
+        self._lock = threading.Lock()
+        self._process: subprocess.Popen[str] | None = None
+        self._lines: queue.Queue[str | None] = queue.Queue()
+
+        build = run_subprocess(["javac", "-d", self._class_dir.name, SERVER_SOURCE], label="javac (compile server)")
+        if build.return_code != 0:
+            msg = f"Unable to build compile server:\n{build.output}"
+            raise RuntimeError(msg)
+        atexit.register(self.close)
+        self._start()
+
+    def _start(self) -> subprocess.Popen[str]:
+        try:
+            process = subprocess.Popen(
+                ["java", "-classpath", self._class_dir.name, "CompileServer"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                encoding="utf-8",
+            )
+        except OSError as e:
+            msg = f"Unable to start compile server: {e}"
+            raise RuntimeError(msg) from e
+        assert process.stdout is not None
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read_lines, args=(process.stdout, self._lines), daemon=True).start()
+        self._process = process
+
+        try:
+            handshake = self._read_line(time.monotonic() + STARTUP_TIMEOUT)
+        except (queue.Empty, RuntimeError):
+            handshake = "no response"
+        if handshake != "ready":
+            self._stop()
+            msg = f"Unable to start compile server: {handshake}"
+            raise RuntimeError(msg)
+        return process
+
+    @staticmethod
+    def _read_lines(stdout: IO[str], lines: "queue.Queue[str | None]") -> None:
+        for line in stdout:
+            lines.put(line.rstrip("\n"))
+        lines.put(None)
+
+    def _read_line(self, deadline: float | None) -> str:
+        line = self._lines.get(timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+        if line is None:
+            msg = "Compile server exited unexpectedly"
+            raise RuntimeError(msg)
+        return line
+
+    def compile(self, args: Sequence[str | Path], timeout: float | None = None) -> CompileResult:
+        """Runs javac with `args` (not including `javac` itself).
+
+        Raises `RuntimeError` if the server dies, in which case the caller should run javac directly.
+        """
+        with self._lock:
+            process = self._process if self._process is not None and self._process.poll() is None else self._start()
+            assert process.stdin is not None
+            deadline = None if timeout is None else time.monotonic() + timeout
+            try:
+                request = [str(len(args))] + [str(arg) for arg in args]
+                process.stdin.write("\n".join(request) + "\n")
+                process.stdin.flush()
+
+                return_code = int(self._read_line(deadline))
+                output = "\n".join(self._read_line(deadline) for _ in range(int(self._read_line(deadline))))
+            except queue.Empty:
+                # javac is stuck; the next compile gets a fresh server.
+                self._stop()
+                return CompileResult("", "", -1, True)
+            except (OSError, RuntimeError) as e:
+                self._stop()
+                msg = f"Compile server failed: {e}"
+                raise RuntimeError(msg) from e
+            return CompileResult(output, "", return_code, False)
+
+    def _stop(self) -> None:
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop()
+        self._class_dir.cleanup()
+
+
+def run_javac(
+    bsagio: BSAGIO,
+    command: Sequence[str | Path],
+    timeout: float | None,
+    use_server: bool = False,
+    label: str = "javac",
+) -> JavacResult:
+    """Runs a `javac ...` command, through the grading run's compile server if `use_server` is set."""
+    if use_server:
+        server: CompileServer | None = bsagio.data.get(COMPILE_SERVER_KEY)
+        if server is None and COMPILE_SERVER_KEY not in bsagio.data:
+            try:
+                server = CompileServer()
+            except RuntimeError as e:
+                bsagio.private.warning(f"{e}\nFalling back to running javac directly.")
+            bsagio.data[COMPILE_SERVER_KEY] = server
+        if server is not None:
+            try:
+                start = time.perf_counter()
+                result = server.compile(command[1:], timeout=timeout)
+                record(
+                    SubprocessTiming(
+                        label=f"{label} (compile server)",
+                        command=list2cmdline(command),
+                        wall=time.perf_counter() - start,
+                        return_code=result.return_code,
+                        timed_out=result.timed_out,
+                    )
+                )
+                return result
+            except RuntimeError as e:
+                bsagio.private.warning(f"{e}\nRunning javac directly.")
+
+    javac_result: JavacResult = run_subprocess(command, label=label, timeout=timeout)
+    return javac_result
@@ -0,0 +1,258 @@
+"""The config models of the `jh61b` steps.
+
+They are kept apart from the steps so that BSAG can parse a config, which needs each step's config model, without
+importing the modules (and libraries) of steps the config doesn't use.
+"""
+
+from pathlib import Path
+from typing import Any
+
+from bsag import BaseStepConfig
+from pydantic import BaseModel, Field, FilePath, PositiveFloat, PositiveInt, ValidationError, validator
+
+from ._types import BaseJh61bConfig, Piece
+
+DEFAULT_PRUNE = [".git/", ".hg/", ".svn/", ".idea/", ".vscode/", "__pycache__/", "/out/"]
+# Steps that don't depend on each other's results: they only read the compiled submission and grader, besides
+# assessment writing its own `TEST_RESULTS_KEY`.
+PARALLEL_STEPS = {"jh61b.api", "jh61b.assessment", "jh61b.checkstyle", "jh61b.dep_check"}
+
+
+class ApiCheckConfig(BaseJh61bConfig):
+    api_checker_class: str = "jh61b.grader.APIChecker"
+    command_timeout: PositiveInt | None = None
+    compile_cache_dir: Path | None = None
+    # Compile through a warm javac shared by the whole grading run, instead of starting javac each time.
+    compile_server: bool = False
+
+
+class PieceAssessmentConfig(BaseModel):
+    java_options: list[str] = []
+    args: list[str] = []
+    command_timeout: PositiveInt | None = None
+    require_full_score: bool = False
+    aggregated_number: str | None = None
+    # When running with `max_workers > 1`, also run this piece's assessment classes concurrently.
+    parallel_classes: bool = False
+    # Run all of this piece's assessment classes in a single JVM, with the bundled `BatchRunner` (or
+    # `batch_runner_class`).
+    batch_classes: bool = False
+    # Split each assessment class's tests across this many concurrent JVMs. The runner gets `--shard-index` and
+    # `--shard-count`, and must run the k-th test in shard k mod `shards` for results to keep their unsharded order.
+    shards: PositiveInt = 1
+    # With `require_full_score`, stop starting this piece's classes once one loses a point, since the piece can no
+    # longer score. The classes that didn't run are reported as failing tests.
+    fail_fast: bool = False
+
+
+class SandboxConfig(BaseModel):
+    # Memory cap per JVM. The heap is sized to `heap_fraction` of it.
+    memory_mb: PositiveInt | None = None
+    heap_fraction: PositiveFloat = 0.5
+    # Pin each JVM to this many CPUs, taking turns across the grader's CPUs.
+    cpus_per_run: PositiveInt | None = None
+    max_threads: PositiveInt | None = None
+    cpu_seconds: PositiveInt | None = None
+    # A delegated cgroup v2 directory. Each JVM then gets its own cgroup, which caps resident rather than virtual
+    # memory and reports OOM kills.
+    cgroup_root: Path | None = None
+
+
+class AssessmentConfig(BaseJh61bConfig):
+    piece_configs: dict[str, PieceAssessmentConfig] = {}
+    default_java_options: list[str] = []
+    command_timeout: PositiveInt | None = None
+    max_workers: PositiveInt = 1
+    # A batch runner on the classpath to use for `batch_classes` instead of the bundled one. It is given the same
+    # arguments (see `BatchRunner.java`).
+    batch_runner_class: str | None = None
+    # Have the runner write one JSON `TestResult` per line as each test finishes (`--ndjson`), so tests that finished
+    # before a timeout or crash are kept. The runner announces its tests' count and max score in a header line and
+    # writes a trailer once all have run; the tests of a class without the trailer count as failed.
+    ndjson_results: bool = False
+    # Cut each test's output to about this many characters, collapsing repeated lines.
+    max_test_output: PositiveInt | None = None
+    # Likewise for the output of a JVM that exits with an error, which is shown to students. The private log keeps it
+    # in full.
+    max_output: PositiveInt | None = None
+    # Once a class has `min_timeout_samples` runtimes recorded here, time it out after `timeout_slack` times their
+    # `timeout_percentile`th percentile (at most its `command_timeout`). Runtimes are only recorded with
+    # `record_timeouts`, which should be set when grading the reference solution, not student submissions.
+    timeout_stats_file: Path | None = None
+    record_timeouts: bool = False
+    timeout_percentile: PositiveFloat = 95
+    timeout_slack: PositiveFloat = 2.0
+    min_timeout_samples: PositiveInt = 5
+    max_timeout_samples: PositiveInt = 200
+    # Seconds for the whole step. Each class is also limited to its share of the time left.
+    deadline: PositiveInt | None = None
+    # Resource limits for each assessment JVM.
+    sandbox: SandboxConfig | None = None
+
+
+class CdsConfig(BaseStepConfig):
+    archive_dir: Path
+    # Dump an archive the first time a classpath is used without a usable one. Run the autograder on the reference
+    # solution while building the image to bake the archives in.
+    create: bool = True
+    # Least recently used archives are removed once the directory grows past this.
+    max_size_mb: PositiveInt = 1024
+
+
+class CheckFilesConfig(BaseJh61bConfig):
+    pieces: dict[str, Piece]
+
+    @validator("pieces")
+    def grader_does_not_have_student_files(cls, v: dict[str, Piece], values: dict[str, Any]) -> dict[str, Piece]:
+        grader_root: Path = values["grader_root"]
+        bad_files: set[str] = set()
+        for piece in v.values():
+            for file in piece.student_files:
+                grader_file = Path(grader_root, file)
+                if grader_file.is_file():
+                    bad_files.add(str(grader_file))
+
+        if bad_files:
+            raise ValueError("Files marked for student submission found in grader:\n" + "\n".join(bad_files))
+
+        return v
+
+
+class CheckStyleConfig(BaseStepConfig):
+    checkstyle_jar_path: FilePath | None
+    checkstyle_xml_path: FilePath
+    submission_root: Path
+    pathspec: list[str] = ["*.java"]
+    command_timeout: PositiveInt
+    # Check all files in one checkstyle run, only splitting up the files if checkstyle fails for non-style reasons.
+    batch: bool = True
+
+
+class CompilationConfig(BaseJh61bConfig):
+    compile_flags: list[str] = []
+    command_timeout: PositiveInt | None = None
+    # Compile every piece in one javac run, then attribute errors to the pieces whose files they are in.
+    batch: bool = False
+    # Restore the grader's compiled classes from (and save them to) this content-addressed cache.
+    compile_cache_dir: Path | None = None
+    # Compile through a warm javac shared by the whole grading run, instead of starting javac each time.
+    compile_server: bool = False
+    # Show students at most about this many characters of each javac run's output, with repeated lines and errors
+    # collapsed. The private log keeps the full output.
+    max_output: PositiveInt | None = None
+
+
+class CopyFromAlternateRootConfig(BaseJh61bConfig):
+    """
+    Configuration for jh61b.copy_from_alternate_root.
+
+    Inherited:
+      - grader_root: Path        (unused here)
+      - submission_root: Path
+
+    Additional:
+      - alternate_root: Path     (directory to copy files *from*)
+      - recursive: bool          (also copy subdirectories)
+      - hardlink: bool           (link instead of copying; only if nothing modifies the copied files)
+      - max_workers: int         (files copied concurrently)
+    """
+
+    alternate_root: Path
+    recursive: bool = False
+    hardlink: bool = False
+    max_workers: PositiveInt = 8
+
+
+class DepCheckConfig(BaseJh61bConfig):
+    allowed_classes: list[str] = ["**"]
+    disallowed_classes: list[str] = []
+    command_timeout: PositiveInt | None = None
+    # Parallel jdeps runs for large submissions. Defaults to the number of CPUs.
+    max_workers: PositiveInt | None = None
+    # Caches each class file's dependencies by content hash, so unchanged classes are never analyzed twice.
+    jdeps_cache_dir: Path | None = None
+
+
+class FileIndexConfig(BaseJh61bConfig):
+    # gitwildmatch patterns for directories not to index, relative to each root. Files under them are still found by
+    # looking at the disk, but are never listed.
+    prune: list[str] = DEFAULT_PRUNE
+
+
+class FinalScoreConfig(BaseStepConfig):
+    max_points: float
+    scoring: dict[str, float]
+    scale_factor: float = 1
+    penalties: dict[str, float] = {}
+    # Compact test outputs so that together they are at most about this many characters, keeping short outputs whole.
+    # Compacted outputs are kept in full in the private log.
+    max_results_output: PositiveInt | None = None
+
+
+class MagicWordConfig(BaseJh61bConfig):
+    magic_word_path: Path = Path("magic_word.txt")
+    magic_word_regex: str | list[str] = []
+
+
+class MotdConfig(BaseStepConfig):
+    path: FilePath
+
+
+class ParallelConfig(BaseJh61bConfig):
+    # Each step is a step name or a `{step name: config}` mapping, as in the top-level config. Steps that take
+    # `grader_root` and `submission_root` default to this step's.
+    steps: list[str | dict[str, dict[str, Any]]]
+    max_workers: PositiveInt | None = None
+    # Filled in from `steps`: each step's name and parsed config.
+    step_configs: list[tuple[str, BaseStepConfig]] = Field(default_factory=list)
+
+    @validator("steps")
+    def steps_are_parallel_steps(
+        cls, v: list[str | dict[str, dict[str, Any]]]
+    ) -> list[str | dict[str, dict[str, Any]]]:
+        for entry in v:
+            if isinstance(entry, dict) and len(entry) != 1:
+                msg = f"Expected a single step name per entry, got {list(entry)}"
+                raise ValueError(msg)
+            name = entry if isinstance(entry, str) else next(iter(entry))
+            if name not in PARALLEL_STEPS:
+                msg = f"{name} can't run in jh61b.parallel; only {', '.join(sorted(PARALLEL_STEPS))} can"
+                raise ValueError(msg)
+        return v
+
+    @validator("step_configs", always=True)
+    def parse_step_configs(
+        cls, v: list[tuple[str, BaseStepConfig]], values: dict[str, Any]
+    ) -> list[tuple[str, BaseStepConfig]]:
+        from ._registry import step_config_type, step_definitions
+
+        if "steps" not in values:
+            return []
+        definitions = step_definitions()
+        step_configs: list[tuple[str, BaseStepConfig]] = []
+        for entry in values["steps"]:
+            name, step_values = (entry, {}) if isinstance(entry, str) else next(iter(entry.items()))
+            config_type = step_config_type(definitions[name])
+            step_values = dict(step_values or {})
+            for field in ("grader_root", "submission_root"):
+                if field in config_type.__fields__ and field in values:
+                    step_values.setdefault(field, values[field])
+            try:
+                step_configs.append((name, config_type.parse_obj(step_values)))
+            except ValidationError as e:
+                msg = f"Invalid config for {name}:\n{e}"
+                raise ValueError(msg) from e
+        return step_configs
+
+
+class ResultCacheConfig(BaseJh61bConfig):
+    cache_dir: Path
+    max_size_mb: PositiveInt = 1024
+    # Other files whose contents should invalidate the cache. List the autograder config here, so that changing the
+    # config of any step does.
+    key_files: list[Path] = Field(default_factory=list)
+
+
+class ScratchConfig(BaseStepConfig):
+    # Where to create the workspace. Defaults to /dev/shm if it is writable, and the system temp directory otherwise.
+    scratch_dir: Path | None = None
@@ -1,29 +1,48 @@
 from bsag import ParamBaseStep
 from bsag.plugin import hookimpl
 
-from .api import ApiCheck
-from .assessment import Assessment
-from .check_files import CheckFiles
-from .checkstyle_jar import CheckStyle
-from .compilation import Compilation
-from .dependency_check import DepCheck
-from .final_score import FinalScore
-from .magic_word import MagicWord
-from .motd import Motd
-from .copy_from_alternate_root import CopyFromAlternateRoot
+from ._configs import (
+    ApiCheckConfig,
+    AssessmentConfig,
+    CdsConfig,
+    CheckFilesConfig,
+    CheckStyleConfig,
+    CompilationConfig,
+    CopyFromAlternateRootConfig,
+    DepCheckConfig,
+    FileIndexConfig,
+    FinalScoreConfig,
+    MagicWordConfig,
+    MotdConfig,
+    ParallelConfig,
+    ResultCacheConfig,
+    ScratchConfig,
+)
+from ._registry import lazy_step
+
+# Step modules (and the libraries they use) are only imported once a step runs, so each step name and config model is
+# listed here as well as in the step's definition.
+_STEP_DEFS = [
+    lazy_step("jh61b.api", ".api:ApiCheck", ApiCheckConfig),
+    lazy_step("jh61b.assessment", ".assessment:Assessment", AssessmentConfig),
+    lazy_step("jh61b.cds", ".cds:Cds", CdsConfig),
+    lazy_step("jh61b.check_files", ".check_files:CheckFiles", CheckFilesConfig),
+    lazy_step("jh61b.checkstyle", ".checkstyle_jar:CheckStyle", CheckStyleConfig),
+    lazy_step("jh61b.compilation", ".compilation:Compilation", CompilationConfig),
+    lazy_step(
+        "jh61b.copy_from_alternate_root", ".copy_from_alternate_root:CopyFromAlternateRoot", CopyFromAlternateRootConfig
+    ),
+    lazy_step("jh61b.dep_check", ".dependency_check:DepCheck", DepCheckConfig),
+    lazy_step("jh61b.final_score", ".final_score:FinalScore", FinalScoreConfig),
+    lazy_step("jh61b.file_index", ".file_index:IndexFiles", FileIndexConfig),
+    lazy_step("jh61b.magic_word", ".magic_word:MagicWord", MagicWordConfig),
+    lazy_step("jh61b.motd", ".motd:Motd", MotdConfig),
+    lazy_step("jh61b.parallel", ".parallel:Parallel", ParallelConfig),
+    lazy_step("jh61b.result_cache", ".result_cache:ResultCache", ResultCacheConfig),
+    lazy_step("jh61b.scratch", ".scratch:Scratch", ScratchConfig),
+]
 
 
 @hookimpl  # type: ignore
 def bsag_load_step_defs() -> list[type[ParamBaseStep]]:
-    return [
-        ApiCheck,
-        Assessment,
-        CheckFiles,        
-        CheckStyle,
-        Compilation,
-        CopyFromAlternateRoot,        
-        DepCheck,
-        FinalScore,
-        MagicWord,
-        Motd,
-    ]
+    return list(_STEP_DEFS)
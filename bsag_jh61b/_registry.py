@@ -0,0 +1,88 @@
+import importlib
+import types
+from typing import Any, ClassVar, TypeVar, get_args
+
+from bsag import BaseStepConfig, BaseStepDefinition, ParamBaseStep
+from bsag.bsagio import BSAGIO
+
+_StepMeta: type = type(BaseStepDefinition)
+Config = TypeVar("Config", bound=BaseStepConfig)
+
+
+class _LazyStepMeta(_StepMeta):  # type: ignore
+    """Looks up anything a `LazyStep` doesn't define on the step it stands in for."""
+
+    def __getattr__(cls, attr: str) -> Any:
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(cls.load(), attr)
+
+
+class LazyStep(BaseStepDefinition[Config], metaclass=_LazyStepMeta):
+    """Stands in for a step whose module is imported only when it runs.
+
+    Each stand-in is parameterized with the step's config model (from `._configs`), which is where BSAG looks for it.
+    """
+
+    _step_name: ClassVar[str]
+    # `.module:ClassName`, relative to this package.
+    _target: ClassVar[str]
+
+    @classmethod
+    def load(cls) -> type[ParamBaseStep]:
+        module, _, class_name = cls._target.partition(":")
+        step: type[ParamBaseStep] = getattr(importlib.import_module(module, __package__), class_name)
+        if step.name() != cls._step_name:
+            msg = f"{cls._target} is {step.name()}, not {cls._step_name}"
+            raise TypeError(msg)
+        expected, actual = _generic_config_type(cls), _generic_config_type(step)
+        if actual is not expected:
+            msg = f"{cls._target} takes {actual.__name__}, not {expected.__name__}"
+            raise TypeError(msg)
+        return step
+
+    @classmethod
+    def name(cls) -> str:
+        return cls._step_name
+
+    @classmethod
+    def display_name(cls, config: Config) -> str:
+        display_name: str = cls.load().display_name(config)
+        return display_name
+
+    @classmethod
+    def run(cls, bsagio: BSAGIO, config: Config) -> bool:
+        success: bool = cls.load().run(bsagio, config)
+        return success
+
+
+def lazy_step(name: str, target: str, config: type[BaseStepConfig]) -> type[ParamBaseStep]:
+    """A `LazyStep` for the step `name`, defined at `target` (`.module:ClassName`) and taking `config`."""
+    class_name = target.partition(":")[2]
+    namespace = {"_step_name": name, "_target": target, "__module__": __name__}
+    # `types.new_class` records `LazyStep[config]` in `__orig_bases__`, as a class statement would.
+    step: type[ParamBaseStep] = types.new_class(
+        class_name, (LazyStep[config],), {"metaclass": _LazyStepMeta}, lambda ns: ns.update(namespace)  # type: ignore
+    )
+    return step
+
+
+def step_definitions() -> dict[str, type[ParamBaseStep]]:
+    """Returns the `jh61b` step definitions by step name."""
+    from ._plugin import bsag_load_step_defs
+
+    return {step.name(): step for step in bsag_load_step_defs()}
+
+
+def step_config_type(step: type[ParamBaseStep]) -> type[BaseStepConfig]:
+    """Returns the config model that `step` is parameterized with, which is how BSAG finds it."""
+    return _generic_config_type(step)
+
+
+def _generic_config_type(step: type[ParamBaseStep]) -> type[BaseStepConfig]:
+    for base in getattr(step, "__orig_bases__", ()):
+        for arg in get_args(base):
+            if isinstance(arg, type) and issubclass(arg, BaseStepConfig):
+                return arg
+    msg = f"Unable to find config type for {step.name()}"
+    raise TypeError(msg)
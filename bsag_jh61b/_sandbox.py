@@ -0,0 +1,217 @@
+"""Runs a command under resource limits: `python _sandbox.py [limits] -- command...`.
+
+The assessment step starts each JVM through this file, which applies the limits to itself and then execs the JVM, so
+the limits cover only that JVM. It is run as a script rather than with `-m`, so that it only imports the standard
+library before exec'ing.
+"""
+
+import argparse
+import itertools
+import os
+import resource
+import shlex
+import signal
+import sys
+import tempfile
+import threading
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import NamedTuple
+
+SHIM = Path(__file__)
+# glibc gives each thread that allocates its own 64 MB malloc arena, which quickly exhausts an address space limit.
+SHIM_ENV = {"MALLOC_ARENA_MAX": "2"}
+# The JVM reserves (not commits) a gigabyte of compressed class space and a large code cache by default, which count
+# against an address space limit, so they are shrunk when the cap is applied with `RLIMIT_AS`.
+RLIMIT_JAVA_OPTIONS = ["-XX:CompressedClassSpaceSize=64m", "-XX:ReservedCodeCacheSize=64m"]
+
+
+class SandboxLimits(NamedTuple):
+    memory_mb: int | None = None
+    heap_fraction: float = 0.5
+    cpus_per_run: int | None = None
+    max_threads: int | None = None
+    cpu_seconds: int | None = None
+    cgroup_root: Path | None = None
+
+
+class SandboxRun(NamedTuple):
+    command: list[str]
+    cgroup: Path | None
+    # Created by the JVM (through `-XX:OnOutOfMemoryError`) if it runs out of memory, just before it exits.
+    oom_marker: Path | None = None
+
+    def _event_count(self, events_file: str, key: str) -> int:
+        if self.cgroup is None:
+            return 0
+        try:
+            events = Path(self.cgroup, events_file).read_text(encoding="utf-8")
+        except OSError:
+            return 0
+        for line in events.splitlines():
+            name, _, count = line.partition(" ")
+            if name == key:
+                return int(count)
+        return 0
+
+    def exit_cause(self, return_code: int) -> str | None:
+        """`exit_cause`, also using the run's cgroup events and out-of-memory marker. Only valid until the run ends.
+
+        Nothing the JVM printed is used, since the code under test controls that.
+        """
+        if self._event_count("memory.events", "oom_kill"):
+            return "was killed for exceeding the memory limit"
+        if self._event_count("pids.events", "max"):
+            return "exceeded the thread limit"
+        if self.oom_marker is not None and self.oom_marker.exists():
+            return "ran out of memory"
+        return exit_cause(return_code)
+
+
+class Sandbox:
+    """Starts commands under `SandboxLimits`.
+
+    Memory and thread limits use a child cgroup of `cgroup_root` when it's a writable cgroup v2 directory with the
+    memory and pids controllers enabled, and otherwise `RLIMIT_AS` and `RLIMIT_NPROC` (which counts every process of the
+    grader's user, and doesn't apply to root). Runs get consecutive blocks of `cpus_per_run` CPUs in turn.
+    """
+
+    def __init__(self, limits: SandboxLimits) -> None:
+        self.limits = limits
+        self.cgroup_root = (
+            limits.cgroup_root if limits.cgroup_root and self._usable_cgroup(limits.cgroup_root) else None
+        )
+        self._cpus = sorted(os.sched_getaffinity(0))
+        self._runs = itertools.count()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _usable_cgroup(cgroup_root: Path) -> bool:
+        try:
+            controllers = Path(cgroup_root, "cgroup.subtree_control").read_text(encoding="utf-8").split()
+        except OSError:
+            return False
+        return {"memory", "pids"} <= set(controllers) and os.access(cgroup_root, os.W_OK)
+
+    def java_options(self) -> list[str]:
+        """JVM options sizing the heap to the memory cap. Later options (such as a piece's own `-Xmx`) override them."""
+        if self.limits.memory_mb is None:
+            return []
+        options = [f"-Xmx{max(int(self.limits.memory_mb * self.limits.heap_fraction), 16)}m"]
+        options += ["-XX:+ExitOnOutOfMemoryError"]
+        if self.cgroup_root is None:
+            options += RLIMIT_JAVA_OPTIONS
+        return options
+
+    def _next_cpus(self) -> list[int]:
+        assert self.limits.cpus_per_run is not None
+        count = min(self.limits.cpus_per_run, len(self._cpus))
+        with self._lock:
+            start = next(self._runs) * count
+        return [self._cpus[(start + i) % len(self._cpus)] for i in range(count)]
+
+    @contextmanager
+    def run(self, command: list[str], runs: int = 1, warn: Callable[[str], None] | None = None) -> Iterator[SandboxRun]:
+        """Yields the `java` command `command` wrapped in the sandbox shim. Its cgroup (if any) is removed on exit,
+        calling `warn` if it can't be.
+
+        A JVM that does the work of several runs (such as a batch) gets `runs` times the CPU time.
+        """
+        shim_args: list[str] = []
+        oom_marker = None
+        if self.limits.memory_mb is not None:
+            # The exit status of `-XX:+ExitOnOutOfMemoryError` can also come from `System.exit`, so the JVM leaves a
+            # marker. It goes first, so a piece's own `-XX:OnOutOfMemoryError` overrides it.
+            oom_marker = Path(tempfile.gettempdir(), f"jh61b-oom-{uuid.uuid4().hex}")
+            command = [command[0], f"-XX:OnOutOfMemoryError=touch {shlex.quote(str(oom_marker))}", *command[1:]]
+        cgroup = None
+        if self.cgroup_root is not None:
+            cgroup = Path(self.cgroup_root, f"jh61b-{uuid.uuid4().hex[:12]}")
+            cgroup.mkdir()
+            if self.limits.memory_mb is not None:
+                Path(cgroup, "memory.max").write_text(str(self.limits.memory_mb * 1024 * 1024), encoding="utf-8")
+                if Path(cgroup, "memory.swap.max").exists():
+                    Path(cgroup, "memory.swap.max").write_text("0", encoding="utf-8")
+            if self.limits.max_threads is not None:
+                Path(cgroup, "pids.max").write_text(str(self.limits.max_threads), encoding="utf-8")
+            shim_args += ["--cgroup", str(cgroup)]
+        else:
+            if self.limits.memory_mb is not None:
+                shim_args += ["--memory-mb", str(self.limits.memory_mb)]
+            if self.limits.max_threads is not None:
+                shim_args += ["--nproc", str(self.limits.max_threads)]
+        if self.limits.cpu_seconds is not None:
+            shim_args += ["--cpu-seconds", str(self.limits.cpu_seconds * runs)]
+        if self.limits.cpus_per_run is not None:
+            shim_args += ["--cpus", ",".join(str(cpu) for cpu in self._next_cpus())]
+
+        try:
+            yield SandboxRun([sys.executable, "-I", str(SHIM), *shim_args, "--", *command], cgroup, oom_marker)
+        finally:
+            if oom_marker is not None:
+                oom_marker.unlink(missing_ok=True)
+            if cgroup is not None:
+                try:
+                    cgroup.rmdir()
+                except OSError as e:
+                    # A process left in the cgroup (such as one the JVM started) keeps it from being removed.
+                    if warn is not None:
+                        warn(f"Unable to remove cgroup {cgroup}: {e!r}")
+
+
+def exit_cause(return_code: int) -> str | None:
+    """Describes why a JVM stopped, if it was killed by a signal. `None` for a normal nonzero exit."""
+    if 0 <= return_code <= 128:
+        return None
+
+    signum = -return_code if return_code < 0 else return_code - 128
+    try:
+        name = signal.Signals(signum).name
+    except ValueError:
+        name = f"signal {signum}"
+    if signum == signal.SIGXCPU:
+        return "exceeded the CPU time limit"
+    if signum == signal.SIGKILL:
+        return "was killed (SIGKILL), most likely for using too much memory"
+    return f"was killed by {name}"
+
+
+def _limit(which: int, soft: int, hard: int | None = None) -> None:
+    _, current_hard = resource.getrlimit(which)
+    hard = soft if hard is None else hard
+    if current_hard != resource.RLIM_INFINITY:
+        soft, hard = min(soft, current_hard), min(hard, current_hard)
+    resource.setrlimit(which, (soft, hard))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--memory-mb", type=int)
+    parser.add_argument("--nproc", type=int)
+    parser.add_argument("--cpu-seconds", type=int)
+    parser.add_argument("--cpus")
+    parser.add_argument("--cgroup", type=Path)
+    parser.add_argument("command", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+
+    if args.cgroup is not None:
+        Path(args.cgroup, "cgroup.procs").write_text(str(os.getpid()), encoding="utf-8")
+    if args.memory_mb is not None:
+        _limit(resource.RLIMIT_AS, args.memory_mb * 1024 * 1024)
+    if args.nproc is not None:
+        _limit(resource.RLIMIT_NPROC, args.nproc)
+    if args.cpu_seconds is not None:
+        # The soft limit sends SIGXCPU, so the cause can be reported; the hard limit is a backstop.
+        _limit(resource.RLIMIT_CPU, args.cpu_seconds, args.cpu_seconds + 1)
+    if args.cpus is not None:
+        os.sched_setaffinity(0, {int(cpu) for cpu in args.cpus.split(",")})
+
+    os.environ.update(SHIM_ENV)
+    os.execvp(command[0], command)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import json
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from bsag.steps.gradescope import Results, TestResult
+
+from ._compact import compact_output
+
+
+def compact_test_output(test: TestResult, max_output: int | None) -> TestResult:
+    if max_output is not None and test.output is not None and len(test.output) > max_output:
+        test.output = compact_output(test.output, max_output)
+    return test
+
+
+def load_json_results(path: str | Path, max_output: int | None) -> list[TestResult]:
+    """Loads a whole `--json` results file. Raises `json.JSONDecodeError` if it is incomplete."""
+    with open(path, encoding="utf-8") as f:
+        results = Results.parse_obj(json.load(f))
+    return [compact_test_output(test, max_output) for test in results.tests]
+
+
+class NdjsonResults(NamedTuple):
+    tests: list[TestResult]
+    # Whether the runner wrote its trailer, so every test it was going to run reported.
+    complete: bool
+    # From the runner's header, if it wrote one: how many tests it was going to run, and their total max score.
+    expected_tests: int | None = None
+    expected_max_score: float | None = None
+
+
+def read_ndjson_results(path: str | Path, max_output: int | None, stopped: bool = False) -> NdjsonResults:
+    """Reads a `--ndjson` results file.
+
+    The runner may start with a header, `{"expected_tests": n, "expected_max_score": x}`, then flushes one
+    `TestResult` per line as each test finishes, and ends with a trailer, `{"test_count": n}`, once every test has run.
+    A file without the trailer is incomplete: the JVM stopped (or the code under test stopped it) early. The file of a
+    JVM that `stopped` (timed out or crashed) may also have its last line cut off. Raises `ValueError` on any other
+    line that doesn't parse.
+    """
+    tests: list[TestResult] = []
+    header: dict[str, Any] = {}
+    test_count: int | None = None
+    with open(path, encoding="utf-8") as f:
+        lines = iter(f)
+        line = next(lines, None)
+        while line is not None:
+            next_line = next(lines, None)
+            if line.strip():
+                try:
+                    data = json.loads(line)
+                    if test_count is not None:
+                        msg = "result after the trailer"
+                        raise ValueError(msg)
+                    if "test_count" in data:
+                        test_count = int(data["test_count"])
+                    elif "expected_tests" in data and not tests and not header:
+                        header = {"expected_tests": int(data["expected_tests"])}
+                        if data.get("expected_max_score") is not None:
+                            header["expected_max_score"] = float(data["expected_max_score"])
+                    else:
+                        tests.append(compact_test_output(TestResult.parse_obj(data), max_output))
+                except (TypeError, ValueError) as e:
+                    if stopped and next_line is None:
+                        break
+                    msg = f"Malformed result in {path}: {line[:200]!r}"
+                    raise ValueError(msg) from e
+            line = next_line
+
+    complete = test_count == len(tests) and header.get("expected_tests", len(tests)) == len(tests)
+    return NdjsonResults(tests, complete, **header)
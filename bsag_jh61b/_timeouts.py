@@ -0,0 +1,109 @@
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """The nearest-rank `pct`th percentile of `samples`."""
+    ordered = sorted(samples)
+    return ordered[min(max(math.ceil(pct / 100 * len(ordered)) - 1, 0), len(ordered) - 1)]
+
+
+class TimeoutPlanner:
+    """Picks the timeout for each assessment class run.
+
+    With a stats file, a class with enough recorded runtimes gets `slack` times the `pct`th percentile of them, capped
+    at its static timeout. Runtimes are only recorded by `recording` runs (of the reference solution), so students
+    can't shrink each other's timeouts. With a deadline, each run is also capped at its share of the time left: the
+    remaining time divided across the classes that haven't started (or been skipped), times the number of workers
+    running them.
+    """
+
+    def __init__(
+        self,
+        stats_file: Path | None,
+        pct: float,
+        slack: float,
+        min_samples: int,
+        max_samples: int,
+        deadline: int | None,
+        workers: int,
+        total_classes: int,
+        recording: bool = False,
+    ) -> None:
+        self.stats_file = stats_file
+        self.pct = pct
+        self.slack = slack
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.deadline_at = time.monotonic() + deadline if deadline is not None else None
+        self.workers = workers
+        self.recording = recording
+        self._lock = threading.Lock()
+        self._unstarted = total_classes
+        self._history = self._load() if stats_file is not None else {}
+        self._new: dict[str, list[float]] = {}
+
+    def _load(self) -> dict[str, list[float]]:
+        assert self.stats_file is not None
+        try:
+            with open(self.stats_file, encoding="utf-8") as f:
+                classes: dict[str, list[float]] = json.load(f)["classes"]
+                return classes
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return {}
+
+    def class_timeout(self, assessment_class: str, static: int | None) -> int | None:
+        samples = self._history.get(assessment_class, [])
+        if len(samples) < self.min_samples:
+            return static
+        adaptive = max(math.ceil(percentile(samples, self.pct) * self.slack), 1)
+        return adaptive if static is None else min(adaptive, static)
+
+    def start(self, assessment_classes: list[str], static: int | None) -> int | None:
+        """Returns the timeout for a run of `assessment_classes`, or 0 if the deadline has passed."""
+        timeouts = [self.class_timeout(assessment_class, static) for assessment_class in assessment_classes]
+        timeout = None if None in timeouts else sum(t for t in timeouts if t is not None)
+        if self.deadline_at is None:
+            return timeout
+
+        with self._lock:
+            remaining = self.deadline_at - time.monotonic()
+            # Classes rerun after a failed batch were already counted.
+            unstarted = max(self._unstarted, 1)
+            share = remaining * min(self.workers, unstarted) / unstarted
+            self._unstarted = max(self._unstarted - len(assessment_classes), 0)
+        share = math.floor(min(share * len(assessment_classes), remaining))
+        if share <= 0:
+            return 0
+        return share if timeout is None else min(timeout, share)
+
+    def skip(self, assessment_classes: list[str]) -> None:
+        """Stops counting `assessment_classes` (such as those `fail_fast` skips) among the classes left to run."""
+        with self._lock:
+            self._unstarted = max(self._unstarted - len(assessment_classes), 0)
+
+    def record(self, assessment_class: str, seconds: float) -> None:
+        if not self.recording:
+            return
+        with self._lock:
+            self._new.setdefault(assessment_class, []).append(seconds)
+
+    def save(self) -> None:
+        """Merges this run's runtimes into the stats file, keeping the latest `max_samples` per class."""
+        if self.stats_file is None or not self._new:
+            return
+        # Reload, so concurrent graders sharing the file only lose samples if they save at the same instant.
+        stats = self._load()
+        for assessment_class, samples in self._new.items():
+            stats[assessment_class] = (stats.get(assessment_class, []) + samples)[-self.max_samples :]
+
+        self.stats_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.stats_file.parent, prefix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"classes": stats}, f)
+        os.replace(tmp, self.stats_file)
@@ -0,0 +1,123 @@
+import functools
+import resource
+import threading
+import time
+from collections.abc import Callable, Sequence
+from contextvars import ContextVar
+from pathlib import Path
+from subprocess import list2cmdline
+from typing import Any, TypeVar
+
+from bsag.bsagio import BSAGIO
+from bsag.utils import subprocesses
+from pydantic import BaseModel
+
+TIMINGS_KEY = "jh61b_timings"
+
+C = TypeVar("C")
+
+
+class SubprocessTiming(BaseModel):
+    label: str
+    command: str
+    wall: float
+    return_code: int
+    timed_out: bool
+    # From `RUSAGE_CHILDREN` deltas, so `None` when not measured (e.g. the compile server).
+    user_cpu: float | None = None
+    sys_cpu: float | None = None
+    # The children's high-water mark, so only known when this process raised it.
+    max_rss_kb: int | None = None
+    # Another subprocess ran at the same time, so its CPU time is mixed into this one's.
+    overlapped: bool = False
+
+
+class StepTiming(BaseModel):
+    wall: float
+    subprocesses: list[SubprocessTiming] = []
+
+
+_current: ContextVar[list[SubprocessTiming] | None] = ContextVar("jh61b_subprocess_timings", default=None)
+_lock = threading.Lock()
+_active = 0
+_started = 0
+
+
+def record(timing: SubprocessTiming) -> None:
+    records = _current.get()
+    if records is not None:
+        records.append(timing)
+
+
+def run_subprocess(args: Sequence[str | Path], *, label: str | None = None, **kwargs: Any) -> Any:
+    """`bsag.utils.subprocesses.run_subprocess`, recording wall time, CPU time and peak RSS for the current step."""
+    global _active, _started
+    with _lock:
+        overlapped = _active > 0
+        _active += 1
+        _started += 1
+        started = _started
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    try:
+        result = subprocesses.run_subprocess(args, **kwargs)
+    finally:
+        wall = time.perf_counter() - start
+        with _lock:
+            after = resource.getrusage(resource.RUSAGE_CHILDREN)
+            overlapped = overlapped or _started != started
+            _active -= 1
+
+    record(
+        SubprocessTiming(
+            label=label or Path(args[0]).name,
+            command=list2cmdline(args),
+            wall=wall,
+            return_code=result.return_code,
+            timed_out=result.timed_out,
+            user_cpu=after.ru_utime - before.ru_utime,
+            sys_cpu=after.ru_stime - before.ru_stime,
+            max_rss_kb=after.ru_maxrss if after.ru_maxrss > before.ru_maxrss else None,
+            overlapped=overlapped,
+        )
+    )
+    return result
+
+
+def _format_summary(step_name: str, timing: StepTiming) -> str:
+    lines = [f"{step_name}: {timing.wall:.3f}s wall, {len(timing.subprocesses)} subprocess(es)"]
+    lines.append(f"{'wall':>9} {'user':>9} {'sys':>9} {'max rss':>10}  command")
+    for sub in sorted(timing.subprocesses, key=lambda s: s.wall, reverse=True):
+        user = f"{sub.user_cpu:9.3f}" if sub.user_cpu is not None else f"{'-':>9}"
+        sys = f"{sub.sys_cpu:9.3f}" if sub.sys_cpu is not None else f"{'-':>9}"
+        rss = f"{sub.max_rss_kb / 1024:7.1f} MB" if sub.max_rss_kb is not None else f"{'-':>10}"
+        flags = " (timed out)" if sub.timed_out else ""
+        flags += " *" if sub.overlapped else ""
+        lines.append(f"{sub.wall:9.3f} {user} {sys} {rss}  {sub.label}{flags}")
+    if any(sub.overlapped for sub in timing.subprocesses):
+        lines.append("* ran alongside other subprocesses, so CPU time and RSS are shared between them")
+    return "\n".join(lines)
+
+
+def timed_step(run: Callable[[Any, BSAGIO, C], bool]) -> Callable[[Any, BSAGIO, C], bool]:
+    """Wraps a step's `run` to record its subprocesses in `bsagio.data[TIMINGS_KEY]` and log a summary table.
+
+    Worker threads only record into the step if they run in a copy of its context (`contextvars.copy_context`).
+    """
+
+    @functools.wraps(run)
+    def wrapper(cls: Any, bsagio: BSAGIO, config: C) -> bool:
+        records: list[SubprocessTiming] = []
+        token = _current.set(records)
+        start = time.perf_counter()
+        try:
+            return run(cls, bsagio, config)
+        finally:
+            _current.reset(token)
+            timing = StepTiming(wall=time.perf_counter() - start, subprocesses=records)
+            if TIMINGS_KEY not in bsagio.data:
+                bsagio.data[TIMINGS_KEY] = {}
+            bsagio.data[TIMINGS_KEY][cls.name()] = timing
+            bsagio.private.info("\n" + _format_summary(cls.name(), timing))
+
+    return wrapper
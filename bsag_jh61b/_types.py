@@ -6,6 +6,7 @@ from pydantic import BaseModel
 
 PIECES_KEY = "jh61b_pieces"
 TEST_RESULTS_KEY = "jh61b_test_results"
+STEP_LOGS_KEY = "jh61b_step_logs"
 
 
 class Piece(BaseModel):
@@ -32,3 +33,12 @@ class Jh61bResults(BaseModel):
     score: float
     max_score: float
     tests: list[TestResult]
+
+
+class StepLog(BaseModel):
+    """The outcome of a step run inside another step (such as `jh61b.parallel`), which BSAG doesn't log itself."""
+
+    name: str
+    success: bool
+    score: float | None = None
+    elapsed: float = 0.0
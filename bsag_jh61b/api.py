@@ -4,16 +4,16 @@ from subprocess import list2cmdline
 
 from bsag import BaseStepDefinition
 from bsag.bsagio import BSAGIO
-from bsag.utils.subprocesses import run_subprocess
-from pydantic import PositiveInt
 
-from ._types import PIECES_KEY, AssessmentPieces, BaseJh61bConfig
+from ._compile_cache import CompileCache
+from ._compile_server import run_javac
+from ._configs import ApiCheckConfig
+from ._timing import run_subprocess, timed_step
+from ._types import PIECES_KEY, AssessmentPieces
+from .cds import cds_finish, cds_options
+from .file_index import is_file_checker
 from .java_utils import path_to_classname
-
-
-class ApiCheckConfig(BaseJh61bConfig):
-    api_checker_class: str = "jh61b.grader.APIChecker"
-    command_timeout: PositiveInt | None = None
+from .scratch import class_root, javac_output_args, with_class_dir
 
 
 class ApiCheck(BaseStepDefinition[ApiCheckConfig]):
@@ -26,18 +26,20 @@ class ApiCheck(BaseStepDefinition[ApiCheckConfig]):
         return "API Checker"
 
     @classmethod
+    @timed_step
     def run(cls, bsagio: BSAGIO, config: ApiCheckConfig) -> bool:
         pieces: AssessmentPieces = bsagio.data[PIECES_KEY]
 
         for name, failed in pieces.failed_pieces.items():
             bsagio.both.info(f"Unable to test API for {name}: {failed.reason}")
 
+        is_file = is_file_checker(bsagio)
         student_classes: set[str] = set()
         api_files: set[Path] = set()
         for _name, piece in pieces.live_pieces.items():
             for student_file in piece.student_files:
                 api_file = Path(config.grader_root, student_file.with_stem("AGAPI" + student_file.stem))
-                if api_file.is_file():
+                if is_file(api_file):
                     student_classes.add(path_to_classname(student_file))
                     api_files.add(api_file)
 
@@ -45,25 +47,53 @@ class ApiCheck(BaseStepDefinition[ApiCheckConfig]):
             bsagio.private.warning("No API files to compile.")
             return False
 
-        bsagio.private.trace("Compiling API checkers")
-        api_compile_command = ["javac", "-encoding", "utf8"]
+        api_compile_command: list[str | Path] = ["javac", "-encoding", "utf8"]
         api_compile_command.extend(["-sourcepath", f"{config.grader_root}:{config.submission_root}"])
+
+        cache = None
+        if config.compile_cache_dir is not None:
+            cache = CompileCache(
+                config.compile_cache_dir,
+                config.grader_root,
+                api_compile_command,
+                class_root(bsagio, config.grader_root),
+                config.submission_root,
+            )
+
+        # The API checkers are always compiled, against this submission; the cache only saves compiling the grader
+        # classes they use.
+        grader_cached = cache is not None and cache.restore()
+        if cache is not None and grader_cached:
+            bsagio.private.info(f"Restored grader classes from compile cache {cache.key[:12]}")
+
+        bsagio.private.trace("Compiling API checkers")
+        api_compile_command.extend(javac_output_args(bsagio, config.grader_root if cache is not None else None))
+        api_compile_command.extend(sorted(api_files))
         bsagio.private.debug("\n" + list2cmdline(api_compile_command))
-        compile_result = run_subprocess(api_compile_command, timeout=config.command_timeout)
+        compile_result = run_javac(
+            bsagio, api_compile_command, config.command_timeout, config.compile_server, label="javac (API)"
+        )
         if compile_result.timed_out:
             bsagio.both.error("API compilation timed out.")
             return False
         if compile_result.return_code != 0:
             bsagio.both.error("API compilation failed.")
             bsagio.private.error("\n" + compile_result.output.strip())
+        elif cache is not None and not grader_cached:
+            cache.store()
 
         classpath = ":".join([str(config.grader_root), str(config.submission_root), os.environ.get("CLASSPATH", "")])
+        classpath = with_class_dir(bsagio, classpath)
         bsagio.private.trace("Testing API")
-        api_test_command: list[str | Path] = ["java", "-classpath", classpath, config.api_checker_class]
+        cds = cds_options(bsagio, classpath)
+        api_test_command: list[str | Path] = ["java", *cds, "-classpath", classpath, config.api_checker_class]
         api_test_command.extend(student_classes)
         bsagio.private.debug("\n" + list2cmdline(api_test_command))
 
-        api_test_result = run_subprocess(api_test_command, timeout=config.command_timeout)
+        api_test_result = run_subprocess(
+            api_test_command, label=config.api_checker_class, timeout=config.command_timeout
+        )
+        cds_finish(bsagio, classpath, cds, not api_test_result.timed_out and api_test_result.return_code == 0)
         passed = True
         if api_test_result.timed_out:
             bsagio.both.error("API checker timed out.")
@@ -1,30 +1,58 @@
 import json
 import os
-import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from contextvars import copy_context
+from itertools import zip_longest
+from pathlib import Path
 from subprocess import list2cmdline
+from typing import Any, NamedTuple
 
 from bsag import BaseStepDefinition
 from bsag.bsagio import BSAGIO
-from bsag.steps.gradescope import METADATA_KEY, Results, SubmissionMetadata, TestCaseStatusEnum, TestResult
-from bsag.utils.subprocesses import run_subprocess
-from pydantic import BaseModel, PositiveInt
-
-from ._types import PIECES_KEY, TEST_RESULTS_KEY, AssessmentPieces, BaseJh61bConfig, Jh61bResults
+from bsag.steps.gradescope import METADATA_KEY, SubmissionMetadata, TestCaseStatusEnum, TestResult
+from pydantic import ValidationError
+
+from ._batch_runner import BATCH_RUNNER_CLASS, batch_runner_dir
+from ._buffered_io import BufferedIO
+from ._compact import compact_output
+from ._configs import AssessmentConfig, PieceAssessmentConfig
+from ._sandbox import Sandbox, SandboxLimits, exit_cause
+from ._test_results import NdjsonResults, load_json_results, read_ndjson_results
+from ._timeouts import TimeoutPlanner
+from ._timing import run_subprocess, timed_step
+from ._types import PIECES_KEY, TEST_RESULTS_KEY, AssessmentPieces, Jh61bResults
+from .cds import cds_finish, cds_options
 from .java_utils import path_to_classname
+from .result_cache import cached_step_result, record_step_result, recording_io, save_cached_run, skip_saving
+from .scratch import result_dir, result_file, with_class_dir
+
+# Appended to a class's name for the placeholder listed when it is skipped, or in place of its tests that didn't
+# report.
+NOT_RUN_SUFFIX = " (not run)"
+INCOMPLETE_SUFFIX = " (incomplete)"
 
 
-class PieceAssessmentConfig(BaseModel):
-    java_options: list[str] = []
-    args: list[str] = []
-    command_timeout: PositiveInt | None = None
-    require_full_score: bool = False
-    aggregated_number: str | None = None
+class PieceRun(NamedTuple):
+    name: str
+    config: PieceAssessmentConfig
+    java_options: list[str]
+    classpath: str
+    timeout: int | None
+    timeouts: TimeoutPlanner
+    sandbox: Sandbox | None
+    # Set once a class loses a point in a `fail_fast` piece.
+    lost_point: threading.Event
+    # The main class and classpath for `batch_classes`, or `None` if there is no batch runner.
+    batch_runner: tuple[str, str] | None = None
 
 
-class AssessmentConfig(BaseJh61bConfig):
-    piece_configs: dict[str, PieceAssessmentConfig] = {}
-    default_java_options: list[str] = []
-    command_timeout: PositiveInt | None = None
+class ClassOutcome(NamedTuple):
+    tests: list[TestResult]
+    success: bool
+    log: BufferedIO
 
 
 class Assessment(BaseStepDefinition[AssessmentConfig]):
@@ -37,160 +65,500 @@ class Assessment(BaseStepDefinition[AssessmentConfig]):
         return "Assessment"
 
     @classmethod
+    @timed_step
     def run(cls, bsagio: BSAGIO, config: AssessmentConfig) -> bool:
+        cached = cached_step_result(bsagio, cls.name())
+        if cached is not None:
+            return cached
+        bsagio = recording_io(bsagio, cls.name())
+
         pieces: AssessmentPieces = bsagio.data[PIECES_KEY]
         sub_meta: SubmissionMetadata = bsagio.data[METADATA_KEY]
 
         all_success = True
 
-        for piece_name in pieces.piece_names:
-            piece_config = config.piece_configs.get(piece_name, PieceAssessmentConfig())
+        java_properties = {
+            "bsag.grader.classroot": config.grader_root,
+            "bsag.submission.classroot": config.submission_root,
+            "bsag.student.email": ",".join(s.email for s in sub_meta.users),
+            "bsag.student.name": ",".join(s.name for s in sub_meta.users),
+        }
+        classpath = with_class_dir(
+            bsagio, f"{config.grader_root}:{config.submission_root}:{os.environ.get('CLASSPATH')}"
+        )
+        timeouts = TimeoutPlanner(
+            config.timeout_stats_file,
+            config.timeout_percentile,
+            config.timeout_slack,
+            config.min_timeout_samples,
+            config.max_timeout_samples,
+            config.deadline,
+            config.max_workers,
+            sum(
+                len(piece.assessment_files) * config.piece_configs.get(name, PieceAssessmentConfig()).shards
+                for name, piece in pieces.live_pieces.items()
+            ),
+            config.record_timeouts,
+        )
+        batch_runner = None
+        if config.batch_runner_class is not None:
+            batch_runner = (config.batch_runner_class, classpath)
+        elif any(config.piece_configs.get(name, PieceAssessmentConfig()).batch_classes for name in pieces.live_pieces):
+            runner_dir = batch_runner_dir(bsagio)
+            if runner_dir is not None:
+                batch_runner = (BATCH_RUNNER_CLASS, f"{classpath}:{runner_dir}")
+        sandbox = None
+        if config.sandbox is not None:
+            sandbox = Sandbox(SandboxLimits(**config.sandbox.dict()))
+            if config.sandbox.cgroup_root is not None and sandbox.cgroup_root is None:
+                bsagio.private.warning(f"Unable to use cgroup {config.sandbox.cgroup_root}; falling back to rlimits")
+
+        # Runs are submitted in piece order, then collected in the same order, so results and logs are
+        # deterministic no matter how many workers there are.
+        # Each group of runs is merged into one result: the shards of a class, or a single run otherwise.
+        piece_runs: dict[str, list[list[Future[list[ClassOutcome]]]]] = {}
+        with ThreadPoolExecutor(max_workers=config.max_workers) as executor:
+            for piece_name in pieces.piece_names:
+                if piece_name not in pieces.live_pieces:
+                    continue
+                piece_config = config.piece_configs.get(piece_name, PieceAssessmentConfig())
+
+                java_options = [f"-D{k}={v}" for k, v in java_properties.items()]
+                java_options += config.default_java_options
+                java_options += piece_config.java_options
+
+                timeout: int | None = piece_config.command_timeout
+                if timeout is None:
+                    timeout = config.command_timeout
 
-            if piece_name not in pieces.live_pieces:
-                if piece_name in pieces.failed_pieces:
-                    reason = pieces.failed_pieces[piece_name].reason
+                piece = pieces.live_pieces[piece_name]
+                assessment_classes = [
+                    path_to_classname(assessment_file.relative_to(config.grader_root))
+                    for assessment_file in sorted(piece.assessment_files)
+                ]
+                if piece_config.parallel_classes:
+                    batches = [[assessment_class] for assessment_class in assessment_classes]
+                else:
+                    batches = [assessment_classes]
+
+                piece_run = PieceRun(
+                    piece_name,
+                    piece_config,
+                    java_options,
+                    classpath,
+                    timeout,
+                    timeouts,
+                    sandbox,
+                    threading.Event(),
+                    batch_runner,
+                )
+                if piece_config.shards > 1:
+                    piece_runs[piece_name] = [
+                        [
+                            executor.submit(
+                                copy_context().run,
+                                cls._assess_classes,
+                                bsagio,
+                                config,
+                                piece_run,
+                                [assessment_class],
+                                (shard, piece_config.shards),
+                            )
+                            for shard in range(piece_config.shards)
+                        ]
+                        for assessment_class in assessment_classes
+                    ]
                 else:
-                    reason = "unknown piece name"
+                    piece_runs[piece_name] = [
+                        [executor.submit(copy_context().run, cls._assess_classes, bsagio, config, piece_run, batch)]
+                        for batch in batches
+                    ]
+
+            for piece_name in pieces.piece_names:
+                if piece_name not in piece_runs:
+                    if piece_name in pieces.failed_pieces:
+                        reason = pieces.failed_pieces[piece_name].reason
+                    else:
+                        reason = "unknown piece name"
+
+                    bsagio.both.error(f"Unable to run assessment for {piece_name}: {reason}")
+                    all_success = False
+                    continue
+
+                bsagio.private.info(f"Testing {piece_name}...")
+
+                test_results: list[TestResult] = []
+                for group in piece_runs[piece_name]:
+                    outcomes = [outcome for run in group for outcome in run.result()]
+                    if len(group) > 1:
+                        outcomes = [cls._merge_shards(outcomes)]
+                    for outcome in outcomes:
+                        outcome.log.replay(bsagio)
+                        test_results.extend(outcome.tests)
+                        if not outcome.success:
+                            all_success = False
+
+                piece_config = config.piece_configs.get(piece_name, PieceAssessmentConfig())
+                if not cls._score_piece(bsagio, piece_name, piece_config, test_results):
+                    all_success = False
+
+        timeouts.save()
+        record_step_result(bsagio, cls.name(), all_success)
+        save_cached_run(bsagio)
+        return all_success
 
-                bsagio.both.error(f"Unable to run assessment for {piece_name}: {reason}")
-                all_success = False
-                continue
+    @classmethod
+    def _assess_classes(
+        cls,
+        bsagio: BSAGIO,
+        config: AssessmentConfig,
+        piece: PieceRun,
+        assessment_classes: list[str],
+        shard: tuple[int, int] | None = None,
+    ) -> list[ClassOutcome]:
+        fail_fast = piece.config.fail_fast and piece.config.require_full_score
+        outcomes: list[ClassOutcome] = []
+        batched: dict[str, ClassOutcome] = {}
+        if (
+            piece.config.batch_classes
+            and piece.batch_runner is not None
+            and len(assessment_classes) > 1
+            and not piece.lost_point.is_set()
+        ):
+            batch_log, batched = cls._assess_batch(bsagio, config, piece, piece.batch_runner, assessment_classes)
+            outcomes.append(ClassOutcome([], True, batch_log))
+
+        for assessment_class in assessment_classes:
+            if assessment_class in batched:
+                outcome = batched[assessment_class]
+            elif fail_fast and piece.lost_point.is_set():
+                outcome = cls._not_run(piece, assessment_class)
+            else:
+                # Each run gets its own outfile so concurrent runs never read each other's results.
+                with result_file(bsagio) as outfile:
+                    outcome = cls._assess_class(bsagio, config, piece, assessment_class, str(outfile), shard)
+
+            outcomes.append(outcome)
+            if fail_fast and (not outcome.success or any(test.score != test.max_score for test in outcome.tests)):
+                piece.lost_point.set()
+        return outcomes
 
-            bsagio.private.info(f"Testing {piece_name}...")
+    @staticmethod
+    def _not_run(piece: PieceRun, assessment_class: str) -> ClassOutcome:
+        piece.timeouts.skip([assessment_class])
+        log = BufferedIO()
+        log.private.info(f"Skipping {assessment_class}, since {piece.name} already lost a point")
+        # Scored 0 of nothing, so it's listed among the failing tests without changing the max score.
+        test = TestResult(
+            name=f"{assessment_class}{NOT_RUN_SUFFIX}",
+            score=0,
+            status=TestCaseStatusEnum.FAILED,
+            output=f"Not run, since an earlier test in {piece.name} failed and it requires full score.",
+        )
+        return ClassOutcome([test], True, log)
 
-            java_properties = {
-                "bsag.grader.classroot": config.grader_root,
-                "bsag.submission.classroot": config.submission_root,
-                "bsag.student.email": ",".join(s.email for s in sub_meta.users),
-                "bsag.student.name": ",".join(s.name for s in sub_meta.users),
-            }
-            java_options = [f"-D{k}={v}" for k, v in java_properties.items()]
-            java_options += config.default_java_options
-            java_options += piece_config.java_options
+    @staticmethod
+    def _ndjson_tests(assessment_class: str, results: NdjsonResults) -> list[TestResult]:
+        """The tests in `results`, and if they are incomplete, a failing test standing in for those that didn't report.
+
+        The stand-in is worth what the missing tests were, if the runner announced their total max score.
+        """
+        if results.complete:
+            return results.tests
+        missing_max_score = None
+        if results.expected_max_score is not None:
+            reported = sum(test.max_score or 0 for test in results.tests)
+            missing_max_score = max(results.expected_max_score - reported, 0)
+        missing = "Some tests"
+        if results.expected_tests is not None:
+            missing = f"{results.expected_tests - len(results.tests)} test(s)"
+        test = TestResult(
+            name=f"{assessment_class}{INCOMPLETE_SUFFIX}",
+            score=0,
+            max_score=missing_max_score,
+            status=TestCaseStatusEnum.FAILED,
+            output=f"{missing} in {assessment_class} didn't run, since the test suite stopped early.",
+        )
+        return [*results.tests, test]
 
-            classpath = f"{config.grader_root}:{config.submission_root}:{os.environ.get('CLASSPATH')}"
+    @staticmethod
+    def _run_java(
+        bsagio: BSAGIO,
+        config: AssessmentConfig,
+        piece: PieceRun,
+        main_args: list[str],
+        label: str,
+        timeout: int | None,
+        log: BufferedIO,
+        runs: int = 1,
+    ) -> tuple[Any, str | None]:
+        """Runs a JVM for `piece`. Returns its result, and why it stopped if it ran out of a resource or was killed."""
+        cds = cds_options(bsagio, piece.classpath)
+        sandbox_options = piece.sandbox.java_options() if piece.sandbox is not None else []
+        command = ["java", *cds, *sandbox_options, *piece.java_options, "-classpath", piece.classpath, *main_args]
+
+        with (
+            piece.sandbox.run(command, runs, log.private.warning) if piece.sandbox is not None else nullcontext()
+        ) as sandbox_run:
+            if sandbox_run is not None:
+                command = sandbox_run.command
+            log.private.debug("\n" + list2cmdline(command))
+            # Grader may use relative paths, so use cwd
+            result = run_subprocess(command, label=label, cwd=config.grader_root, timeout=timeout)
+            cause = None
+            if not result.timed_out and result.return_code != 0:
+                cause = (
+                    sandbox_run.exit_cause(result.return_code)
+                    if sandbox_run is not None
+                    else exit_cause(result.return_code)
+                )
 
-            piece = pieces.live_pieces[piece_name]
-            test_results: list[TestResult] = []
-            _, outfile = tempfile.mkstemp(suffix=".json", prefix="assess")
-            for assessment_file in piece.assessment_files:
-                assessment_class = path_to_classname(assessment_file.relative_to(config.grader_root))
+        cds_finish(bsagio, piece.classpath, cds, not result.timed_out and result.return_code == 0)
+        return result, cause
 
-                assessment_command = ["java"] + java_options
-                assessment_command += ["-classpath", classpath, assessment_class]
-                assessment_command += ["--secure", "--json", "--outfile", outfile]
-                assessment_command += piece_config.args
+    @classmethod
+    def _assess_batch(
+        cls,
+        bsagio: BSAGIO,
+        config: AssessmentConfig,
+        piece: PieceRun,
+        runner: tuple[str, str],
+        assessment_classes: list[str],
+    ) -> tuple[BufferedIO, dict[str, ClassOutcome]]:
+        """Runs every class in one JVM. The batch `runner` (its main class and classpath) writes `<class>.json` to the
+        outdir as each class finishes.
+
+        Only classes that produced a result are returned. If the JVM times out or dies, the class that was running and
+        every class after it are missing, and the caller reruns them one per JVM so that the failure is attributed to
+        the class that caused it.
+        """
+        log = BufferedIO()
+        timeout = piece.timeouts.start(assessment_classes, piece.timeout)
+        if timeout == 0:
+            return log, {}
+        with result_dir(bsagio) as outdir:
+            runner_class, runner_classpath = runner
+            batch_args = [runner_class, "--secure", "--json", "--outdir", str(outdir)]
+            batch_args += piece.config.args
+            batch_args += ["--"] + assessment_classes
+
+            result, cause = cls._run_java(
+                bsagio,
+                config,
+                piece._replace(classpath=runner_classpath),
+                batch_args,
+                f"{len(assessment_classes)} classes (batch)",
+                timeout,
+                log,
+                runs=len(assessment_classes),
+            )
 
-                bsagio.private.debug("\n" + list2cmdline(assessment_command))
+            outcomes: dict[str, ClassOutcome] = {}
+            for assessment_class in assessment_classes:
+                try:
+                    tests = load_json_results(Path(outdir, f"{assessment_class}.json"), config.max_test_output)
+                except (FileNotFoundError, json.JSONDecodeError, ValidationError):
+                    break
+                outcomes[assessment_class] = ClassOutcome(tests, True, BufferedIO())
 
-                if piece_config.command_timeout is not None:
-                    timeout = piece_config.command_timeout
+            if len(outcomes) < len(assessment_classes):
+                rerun = assessment_classes[len(outcomes)]
+                if result.timed_out:
+                    status = "timed out"
+                elif result.return_code != 0:
+                    status = cause or f"exited with code {result.return_code}"
                 else:
-                    timeout = config.command_timeout
+                    status = "left no readable results"
+                log.private.warning(f"Batch {status} at {rerun}; rerunning the remaining classes separately")
+            return log, outcomes
 
-                # Grader may use relative paths, so use cwd
-                result = run_subprocess(
-                    assessment_command,
-                    cwd=config.grader_root,
-                    timeout=timeout,
+    @classmethod
+    def _assess_class(
+        cls,
+        bsagio: BSAGIO,
+        config: AssessmentConfig,
+        piece: PieceRun,
+        assessment_class: str,
+        outfile: str,
+        shard: tuple[int, int] | None = None,
+    ) -> ClassOutcome:
+        log = BufferedIO()
+
+        result_format = "--ndjson" if config.ndjson_results else "--json"
+        assessment_args = [assessment_class, "--secure", result_format, "--outfile", outfile]
+        assessment_args += piece.config.args
+        # Shards are timed (and their runtimes recorded) separately from the whole class.
+        run_name = assessment_class
+        if shard is not None:
+            assessment_args += ["--shard-index", str(shard[0]), "--shard-count", str(shard[1])]
+            run_name = f"{assessment_class} (shard {shard[0] + 1}/{shard[1]})"
+
+        timeout = piece.timeouts.start([run_name], piece.timeout)
+        if timeout == 0:
+            skip_saving(bsagio, f"the deadline passed before running {assessment_class}")
+            log.private.error(f"deadline passed before running {assessment_class}")
+            log.student.error(f"The autograder ran out of time before running the test suite {assessment_class}.")
+            return ClassOutcome([], False, log)
+
+        start = time.perf_counter()
+        result, cause = cls._run_java(bsagio, config, piece, assessment_args, run_name, timeout, log)
+        if not result.timed_out and result.return_code == 0:
+            piece.timeouts.record(run_name, time.perf_counter() - start)
+        else:
+            skip_saving(bsagio, f"{run_name} timed out" if result.timed_out else f"{run_name} exited with an error")
+        # Tests that finished before the JVM timed out or died, and one failing in place of the rest. The whole-file
+        # format has none.
+        partial: list[TestResult] = []
+        if config.ndjson_results and (result.timed_out or result.return_code != 0):
+            try:
+                stopped_results = read_ndjson_results(outfile, config.max_test_output, stopped=True)
+            except ValueError as e:
+                log.private.error(f"Error decoding output for {assessment_class}: {e}")
+            else:
+                partial = cls._ndjson_tests(assessment_class, stopped_results)
+                if stopped_results.tests:
+                    count = len(stopped_results.tests)
+                    log.private.info(f"Kept {count} test result(s) from {assessment_class} before it stopped")
+
+        if result.timed_out:
+            log.private.error(f"timed out while running {assessment_class}")
+            log.student.error(
+                f"Your submission timed out on the test suite {assessment_class}.\n"
+                "Please make sure your code terminates on all inputs, and doesn't take too long to do so."
+            )
+            return ClassOutcome(partial, False, log)
+        # This won't execute just due to tests failing. `jh61b` is a test harness that wraps those failures.
+        # Instead, we get a bad return code if:
+        # - The test was killed by external timeout (see above)
+        # - The JVM killed the test due to heap memory, or it hit a sandbox limit (see `exit_cause`)
+        # - The harness itself errors (unlikely)
+        # - The test or code under test calls `System.exit` (likely)
+        if result.return_code != 0:
+            log.private.error(f"process died with code {result.return_code} running {assessment_class}:")
+            log.private.error(f"stdout: {result.output}")
+            log.private.error(f"stderr: {result.stderr}")
+            log.private.error(f"timed_out: {result.timed_out}")
+            if cause is not None:
+                log.private.error(f"{assessment_class} {cause}")
+                log.student.error(
+                    f"Your submission failed to complete on the test suite {assessment_class}: it {cause}."
                 )
-                if result.timed_out:
-                    bsagio.private.error(f"timed out while running {assessment_class}")
-                    bsagio.student.error(
-                        f"Your submission timed out on the test suite {assessment_class}.\n"
-                        "Please make sure your code terminates on all inputs, and doesn't take too long to do so."
-                    )
-                    all_success = False
-                    continue
-                # This won't execute just due to tests failing. `jh61b` is a test harness that wraps those failures.
-                # Instead, we get a bad return code if:
-                # - The test was killed by external timeout (see above)
-                # - The JVM killed the test due to heap memory
-                # - The harness itself errors (unlikely)
-                # - The test or code under test calls `System.exit` (likely)
-                if result.return_code != 0:
-                    all_success = False
-                    bsagio.private.error(f"process died with code {result.return_code} running {assessment_class}:")
-                    bsagio.private.error(f"stdout: {result.output}")
-                    bsagio.private.error(f"stderr: {result.stderr}")
-                    bsagio.private.error(f"timed_out: {result.timed_out}")
-                    if result.return_code > 128 or result.return_code < 0:
-                        bsagio.student.error(
-                            f"Your submission failed to complete on the test suite {assessment_class}.\n"
-                            "You're most likely using too much memory."
-                        )
-                    else:
-                        # If we got system.err'd, expose the output.
-                        bsagio.student.error(f"In piece {piece_name}, test {assessment_class} exited with an error:")
-                        bsagio.student.error(result.output)
-                    continue
+            else:
+                # If we got system.err'd, expose the output.
+                log.student.error(f"In piece {piece.name}, test {assessment_class} exited with an error:")
+                if config.max_output is not None:
+                    log.student.error(compact_output(result.output, config.max_output))
+                else:
+                    log.student.error(result.output)
+            return ClassOutcome(partial, False, log)
+
+        # jh61b produces an entire Results, but we may have multiple Assessments.
+        try:
+            ndjson = read_ndjson_results(outfile, config.max_test_output) if config.ndjson_results else None
+            tests = ndjson.tests if ndjson is not None else load_json_results(outfile, config.max_test_output)
+        except ValueError:
+            skip_saving(bsagio, f"the results of {run_name} didn't parse")
+            log.private.error(f"Error decoding output for {assessment_class}")
+            log.private.error("\n" + result.output)
+            log.student.error("Unexpected error while running assessment; details in staff logs.")
+            return ClassOutcome([], False, log)
+
+        # Without its trailer, the runner didn't get to the end, most likely because the code under test exited.
+        if ndjson is not None and not ndjson.complete:
+            skip_saving(bsagio, f"{run_name} stopped before reporting all of its tests")
+            log.private.error(f"{assessment_class} exited without reporting all of its tests:")
+            log.private.error(f"stdout: {result.output}")
+            log.student.error(
+                f"The test suite {assessment_class} stopped before all of its tests ran.\n"
+                "Please make sure your code doesn't call `System.exit`."
+            )
+            return ClassOutcome(cls._ndjson_tests(assessment_class, ndjson), False, log)
 
-                # jh61b produces an entire Results, but we may have multiple Assessments.
-                try:
-                    with open(outfile, encoding="utf-8") as f:
-                        test_json = json.load(f)
-                    results = Results.parse_obj(test_json)
-                    test_results.extend(results.tests)
-                except json.JSONDecodeError:
-                    bsagio.private.error(f"Error decoding output for {assessment_class}")
-                    bsagio.private.error("\n" + result.output)
-                    bsagio.student.error("Unexpected error while running assessment; details in staff logs.")
+        return ClassOutcome(tests, True, log)
 
-                    all_success = False
+    @staticmethod
+    def _merge_shards(shard_outcomes: list[ClassOutcome]) -> ClassOutcome:
+        """Merges the shards of one class back into its unsharded test order.
+
+        Shard i has tests i, i + n, i + 2n, ... so they are interleaved. Tests from different shards are never merged,
+        even with the same name; only a class's "not run" placeholder is listed once. A runner that ignores the shard
+        arguments reports the same tests from every shard, so only the first shard's are kept, and the max score isn't
+        multiplied.
+        """
+        log = BufferedIO()
+        for outcome in shard_outcomes:
+            log.records.extend(outcome.log.records)
+        success = all(outcome.success for outcome in shard_outcomes)
+
+        test_ids = [[(test.name, test.number) for test in outcome.tests] for outcome in shard_outcomes]
+        if test_ids[0] and all(ids == test_ids[0] for ids in test_ids):
+            return ClassOutcome(shard_outcomes[0].tests, success, log)
+
+        tests: list[TestResult] = []
+        not_run: set[str | None] = set()
+        for round_tests in zip_longest(*(outcome.tests for outcome in shard_outcomes)):
+            for test in round_tests:
+                if test is None:
                     continue
+                if test.name is not None and test.name.endswith(NOT_RUN_SUFFIX):
+                    if test.name in not_run:
+                        continue
+                    not_run.add(test.name)
+                tests.append(test)
+        return ClassOutcome(tests, success, log)
 
-            score = 0.0
-            max_score = 0.0
+    @staticmethod
+    def _score_piece(
+        bsagio: BSAGIO, piece_name: str, piece_config: PieceAssessmentConfig, test_results: list[TestResult]
+    ) -> bool:
+        score = 0.0
+        max_score = 0.0
+        for test in test_results:
+            score += test.score or 0
+            max_score += test.max_score or 0
+
+        bsagio.private.info(f"Scored {score:.3f} / {max_score:.3f} points on {piece_name}")
+
+        if TEST_RESULTS_KEY not in bsagio.data:
+            bsagio.data[TEST_RESULTS_KEY] = {}
+
+        if piece_config.require_full_score:
+            failed_tests: list[str] = []
             for test in test_results:
-                score += test.score or 0
-                max_score += test.max_score or 0
-
-            bsagio.private.info(f"Scored {score:.3f} / {max_score:.3f} points on {piece_name}")
-
-            if TEST_RESULTS_KEY not in bsagio.data:
-                bsagio.data[TEST_RESULTS_KEY] = {}
-
-            if piece_config.require_full_score:
-                if score != max_score:
-                    bsagio.private.info(f"{piece_name} requires full score to receive credit.")
-                    score = 0
-
-                failed_tests: list[str] = []
-                for test in test_results:
-                    if test.score != test.max_score:
-                        test.status = TestCaseStatusEnum.FAILED
-                        failed_tests.append(
-                            "- "
-                            + (test.number + ") " if test.number else "")
-                            + (test.name if test.name else "Unnamed test")
-                        )
-                    test.score = None
-                    test.max_score = None
-
-                output_chunks = [
-                    f"{piece_name} requires full score to receive credit.",
-                ]
-                if failed_tests:
-                    output_chunks.append("Failing the following tests:")
-                    output_chunks.append("")
-                    output_chunks.extend(failed_tests)
-
-                test_results.insert(
-                    0,
-                    TestResult(
-                        name=piece_name,
-                        number=piece_config.aggregated_number,
-                        score=score,
-                        max_score=max_score,
-                        output="\n".join(output_chunks),
-                    ),
-                )
-
-            bsagio.data[TEST_RESULTS_KEY][piece_name] = Jh61bResults(
-                score=score, max_score=max_score, tests=test_results
+                if test.score != test.max_score:
+                    test.status = TestCaseStatusEnum.FAILED
+                    failed_tests.append(
+                        "- "
+                        + (test.number + ") " if test.number else "")
+                        + (test.name if test.name else "Unnamed test")
+                    )
+                test.score = None
+                test.max_score = None
+
+            # A failing test may not count towards the max score, such as one standing in for tests that didn't run.
+            if score != max_score or failed_tests:
+                bsagio.private.info(f"{piece_name} requires full score to receive credit.")
+                score = 0
+
+            output_chunks = [
+                f"{piece_name} requires full score to receive credit.",
+            ]
+            if failed_tests:
+                output_chunks.append("Failing the following tests:")
+                output_chunks.append("")
+                output_chunks.extend(failed_tests)
+
+            test_results.insert(
+                0,
+                TestResult(
+                    name=piece_name,
+                    number=piece_config.aggregated_number,
+                    score=score,
+                    max_score=max_score,
+                    output="\n".join(output_chunks),
+                ),
             )
 
-            if not piece_config.require_full_score and score != max_score:
-                all_success = False
+        bsagio.data[TEST_RESULTS_KEY][piece_name] = Jh61bResults(score=score, max_score=max_score, tests=test_results)
 
-        return all_success
+        return piece_config.require_full_score or score == max_score
@@ -0,0 +1,267 @@
+"""Regrades a directory of submissions with the `jh61b` steps, outside of a full BSAG run.
+
+Every subdirectory of the submissions directory is graded as one submission, in its own copy of the grader and
+submission trees, on a pool of worker processes. Each submission's results are written to `<output>/<name>.json`, and
+a `summary.csv` is rebuilt from those at the end. Submissions that already have results are skipped, so an
+interrupted batch can be resumed by running the same command again.
+
+    python -m bsag_jh61b.batch config.yml submissions/ results/ --grader-root grader/ --max-workers 8
+"""
+
+import argparse
+import csv
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, NamedTuple, cast
+
+import yaml
+from bsag.bsagio import BSAGIO
+from bsag.steps.gradescope import METADATA_KEY, RESULTS_KEY, Results, SubmissionMetadata
+from pydantic import BaseModel
+
+from ._buffered_io import BufferedBSAGIO
+from ._registry import step_config_type, step_definitions
+from ._sandbox import SHIM_ENV, Sandbox, SandboxLimits
+from .scratch import scratch_workspace
+
+SUMMARY_FILE = "summary.csv"
+METADATA_FILE = "submission_metadata.json"
+# Options set by the user, which are kept ahead of those sizing the JVMs to the memory limit.
+JAVA_TOOL_OPTIONS = os.environ.get("JAVA_TOOL_OPTIONS", "")
+
+
+class BatchLimits(NamedTuple):
+    cpu_seconds: int | None = None
+    memory_mb: int | None = None
+
+
+class BatchStepLog(BaseModel):
+    name: str
+    success: bool
+    score: float | None = None
+    elapsed: float = 0.0
+
+
+class SubmissionTask(NamedTuple):
+    name: str
+    submission_dir: Path
+    submission_subdir: Path
+    grader_root: Path
+    steps: list[tuple[str, dict[str, Any]]]
+    compile_cache_dir: Path | None
+    limits: BatchLimits
+
+
+def load_steps(config_path: Path) -> list[tuple[str, dict[str, Any]]]:
+    """Reads a list of steps, each either a step name or a `{step name: config}` mapping, as in the README."""
+    with open(config_path, encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    if isinstance(config, dict):
+        config = config.get("steps", [])
+
+    steps: list[tuple[str, dict[str, Any]]] = []
+    for entry in config:
+        if isinstance(entry, str):
+            steps.append((entry, {}))
+        else:
+            ((name, values),) = entry.items()
+            steps.append((name, values or {}))
+    return steps
+
+
+def _apply_limits(limits: BatchLimits) -> None:
+    # Limits are inherited by every JVM the steps start. Workers are reused, so the CPU limit counts from what the
+    # worker has used so far.
+    if limits.cpu_seconds is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(resource.RLIMIT_CPU, (int(usage.ru_utime + usage.ru_stime) + limits.cpu_seconds, hard))
+    if limits.memory_mb is not None:
+        # Without these, the JVMs reserve more address space than the limit allows and fail to start.
+        java_options = Sandbox(SandboxLimits(memory_mb=limits.memory_mb)).java_options()
+        os.environ["JAVA_TOOL_OPTIONS"] = " ".join([JAVA_TOOL_OPTIONS, *java_options]).strip()
+        os.environ.update(SHIM_ENV)
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (limits.memory_mb * 1024 * 1024, hard))
+
+
+def _load_metadata(submission_dir: Path) -> SubmissionMetadata:
+    metadata_file = Path(submission_dir, METADATA_FILE)
+    if metadata_file.is_file():
+        return SubmissionMetadata.parse_file(metadata_file)
+    return SubmissionMetadata.construct(users=[], created_at=datetime.now(timezone.utc))
+
+
+def grade_submission(task: SubmissionTask) -> dict[str, Any]:
+    """Runs the configured steps against one submission. Step errors are recorded rather than raised."""
+    _apply_limits(task.limits)
+    definitions = step_definitions()
+    start = time.monotonic()
+
+    bsagio = BufferedBSAGIO({}, [])
+    with tempfile.TemporaryDirectory(prefix="jh61b-batch") as workdir:
+        # Compilation writes class files next to the sources, so every submission gets its own copy of both trees.
+        grader_root = Path(workdir, "grader")
+        submission_root = Path(workdir, "submission", task.submission_subdir)
+        shutil.copytree(task.grader_root, grader_root)
+        shutil.copytree(task.submission_dir, Path(workdir, "submission"))
+
+        bsagio.data[RESULTS_KEY] = Results(tests=[])
+        bsagio.data[METADATA_KEY] = _load_metadata(task.submission_dir)
+
+        for name, values in task.steps:
+            if name not in definitions:
+                bsagio.private.warning(f"Skipping {name}, which isn't a jh61b step")
+                continue
+            step = definitions[name]
+            config_type = step_config_type(step)
+
+            values = dict(values)
+            if "grader_root" in config_type.__fields__:
+                values["grader_root"] = grader_root
+            if "submission_root" in config_type.__fields__:
+                values["submission_root"] = submission_root
+            # With --compile-cache, grader classes are compiled by the first submission and restored by the rest.
+            if task.compile_cache_dir is not None and "compile_cache_dir" in config_type.__fields__:
+                values.setdefault("compile_cache_dir", task.compile_cache_dir)
+
+            step_start = time.monotonic()
+            try:
+                config = config_type.parse_obj(values)
+                success = step.run(cast(BSAGIO, bsagio), config)
+            except Exception as e:  # noqa: BLE001
+                bsagio.private.error(f"{name} raised {e!r}")
+                success = False
+            bsagio.step_logs.append(BatchStepLog(name=name, success=success, elapsed=time.monotonic() - step_start))
+
+        # Workers grade many submissions, so a `jh61b.scratch` workspace is removed now rather than when they exit.
+        workspace = scratch_workspace(cast(BSAGIO, bsagio))
+        if workspace is not None:
+            workspace.cleanup()
+
+    results: Results = bsagio.data[RESULTS_KEY]
+    return {
+        "submission": task.name,
+        "score": results.score,
+        "elapsed": time.monotonic() - start,
+        "steps": [step_log.dict() for step_log in bsagio.step_logs],
+        "results": json.loads(results.json(exclude_none=True)),
+        "log": [record._asdict() for record in bsagio.records],
+    }
+
+
+def _write_json(path: Path, obj: dict[str, Any]) -> None:
+    # Written atomically, so an interrupted batch never leaves a partial result that would be skipped on resume.
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp, path)
+
+
+def write_summary(output_dir: Path) -> None:
+    with open(Path(output_dir, SUMMARY_FILE), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["submission", "score", "failed_steps", "elapsed"])
+        for result_file in sorted(output_dir.glob("*.json")):
+            with open(result_file, encoding="utf-8") as rf:
+                result = json.load(rf)
+            failed_steps = [step["name"] for step in result["steps"] if not step["success"]]
+            writer.writerow([result["submission"], result["score"], " ".join(failed_steps), f"{result['elapsed']:.3f}"])
+
+
+def run_batch(
+    config_path: Path,
+    submissions_dir: Path,
+    output_dir: Path,
+    grader_root: Path,
+    submission_subdir: Path = Path(),
+    max_workers: int | None = None,
+    limits: BatchLimits | None = None,
+    compile_cache: bool = False,
+) -> bool:
+    """Grades every submission that doesn't have results yet. Returns whether every submission was graded."""
+    steps = load_steps(config_path)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    compile_cache_dir = Path(output_dir, ".compile-cache") if compile_cache else None
+
+    pending = [
+        submission_dir
+        for submission_dir in sorted(submissions_dir.iterdir())
+        if submission_dir.is_dir() and not Path(output_dir, f"{submission_dir.name}.json").is_file()
+    ]
+    print(f"Grading {len(pending)} submissions", file=sys.stderr)
+
+    all_graded = True
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                grade_submission,
+                SubmissionTask(
+                    submission_dir.name,
+                    submission_dir,
+                    submission_subdir,
+                    grader_root,
+                    steps,
+                    compile_cache_dir,
+                    limits or BatchLimits(),
+                ),
+            ): submission_dir.name
+            for submission_dir in pending
+        }
+        for i, future in enumerate(as_completed(futures), start=1):
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # noqa: BLE001
+                # The worker itself died (e.g. it was killed for using too much memory). No result is written, so the
+                # submission is retried when the batch is resumed.
+                print(f"[{i}/{len(pending)}] {name}: {e!r}", file=sys.stderr)
+                all_graded = False
+                continue
+            _write_json(Path(output_dir, f"{name}.json"), result)
+            print(f"[{i}/{len(pending)}] {name}: {result['score']}", file=sys.stderr)
+
+    write_summary(output_dir)
+    return all_graded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Regrade a directory of submissions with the jh61b steps.")
+    parser.add_argument("config", type=Path, help="YAML list of steps, as in the README")
+    parser.add_argument("submissions", type=Path, help="directory with one subdirectory per submission")
+    parser.add_argument("output", type=Path, help="directory for per-submission results and summary.csv")
+    parser.add_argument("--grader-root", type=Path, required=True)
+    parser.add_argument(
+        "--submission-subdir", type=Path, default=Path(), help="submission_root, relative to each submission"
+    )
+    parser.add_argument("--max-workers", type=int, default=None)
+    parser.add_argument("--cpu-seconds", type=int, default=None, help="CPU time limit for each process")
+    parser.add_argument("--memory-mb", type=int, default=None, help="address space limit for each process")
+    parser.add_argument(
+        "--compile-cache", action="store_true", help="share compiled grader classes between submissions"
+    )
+    args = parser.parse_args()
+
+    graded = run_batch(
+        args.config,
+        args.submissions,
+        args.output,
+        args.grader_root.resolve(),
+        args.submission_subdir,
+        args.max_workers,
+        BatchLimits(args.cpu_seconds, args.memory_mb),
+        args.compile_cache,
+    )
+    sys.exit(0 if graded else 1)
+
+
+if __name__ == "__main__":
+    main()
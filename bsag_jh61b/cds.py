@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from pathlib import Path
+
+from bsag import BaseStepDefinition
+from bsag.bsagio import BSAGIO
+
+from ._configs import CdsConfig
+from ._timing import run_subprocess
+
+CDS_KEY = "jh61b_cds_archives"
+JAVA_VERSION_PAT = re.compile(r'version "(?:1\.)?(?P<major>\d+)')
+# `-XX:ArchiveClassesAtExit` (dynamic archives) was added in JDK 13.
+MIN_JAVA_VERSION = 13
+# A stale or unusable archive is silently ignored by the JVM with `-Xshare:auto`; don't let it warn on stdout either.
+QUIET_OPTIONS = ["-Xshare:auto", "-Xlog:cds*=off,class+path=off"]
+
+
+class CdsArchives:
+    """Class-data sharing archives for the grader JVMs, one per classpath.
+
+    Only classpaths made entirely of jars get an archive: HotSpot won't dump one with a non-empty directory on the
+    classpath, and checks the classpath the JVM actually runs with (not the one an archive is keyed on) when using one.
+    An archive is only used while its recorded classpath, jar sizes and mtimes, and Java version still match, so a
+    stale archive is skipped rather than silently disabled by the JVM.
+    """
+
+    def __init__(self, archive_dir: Path, create: bool, max_size_mb: int, java_version: str) -> None:
+        self.archive_dir = archive_dir
+        self.create = create
+        self.max_size_mb = max_size_mb
+        self.java_version = java_version
+        self._lock = threading.Lock()
+        self._dumping: set[Path] = set()
+
+    def _signature(self, classpath: str) -> dict[str, object]:
+        jars: dict[str, list[int]] = {}
+        for entry in classpath.split(":"):
+            path = Path(entry)
+            if entry and path.is_file():
+                stat = path.stat()
+                jars[entry] = [stat.st_size, stat.st_mtime_ns]
+        return {"classpath": classpath, "java_version": self.java_version, "jars": jars}
+
+    def _archive(self, classpath: str) -> Path:
+        digest = hashlib.sha256(f"{self.java_version}\0{classpath}".encode()).hexdigest()
+        return Path(self.archive_dir, f"{digest[:24]}.jsa")
+
+    def java_options(self, classpath: str) -> list[str]:
+        """Returns the JVM options to use (or dump) the archive for `classpath`. Pass them to `finish` afterwards."""
+        if not _all_jars(classpath):
+            return []
+        archive = self._archive(classpath)
+        signature_file = archive.with_suffix(".json")
+        if archive.is_file() and signature_file.is_file():
+            with open(signature_file, encoding="utf-8") as f:
+                if json.load(f) == self._signature(classpath):
+                    # Mark as recently used for eviction.
+                    os.utime(archive)
+                    return [f"-XX:SharedArchiveFile={archive}", *QUIET_OPTIONS]
+
+        with self._lock:
+            if not self.create or archive in self._dumping:
+                return []
+            self._dumping.add(archive)
+        dump = archive.with_name(f"{archive.stem}.{uuid.uuid4().hex}.tmp")
+        return [f"-XX:ArchiveClassesAtExit={dump}", *QUIET_OPTIONS]
+
+    def finish(self, classpath: str, options: list[str], success: bool) -> None:
+        """Publishes an archive dumped by a JVM started with `options`, if it exited successfully."""
+        dump = next(
+            (Path(opt.split("=", 1)[1]) for opt in options if opt.startswith("-XX:ArchiveClassesAtExit=")), None
+        )
+        if dump is None:
+            return
+
+        archive = self._archive(classpath)
+        try:
+            if success and dump.is_file():
+                os.replace(dump, archive)
+                tmp = archive.with_name(f"{dump.name}.json")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(self._signature(classpath), f)
+                os.replace(tmp, archive.with_suffix(".json"))
+                self._evict()
+        finally:
+            dump.unlink(missing_ok=True)
+            with self._lock:
+                self._dumping.discard(archive)
+
+    def _evict(self) -> None:
+        """Removes least recently used archives, and their signatures, while the directory is over the size limit."""
+        entries = []
+        for archive in self.archive_dir.glob("*.jsa"):
+            try:
+                stat = archive.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, archive))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, archive in sorted(entries):
+            if total_size <= self.max_size_mb * 1024 * 1024:
+                break
+            archive.with_suffix(".json").unlink(missing_ok=True)
+            archive.unlink(missing_ok=True)
+            total_size -= size
+
+
+def _all_jars(classpath: str) -> bool:
+    # An empty entry is the working directory.
+    entries = classpath.split(":")
+    return all(entry.endswith(".jar") and Path(entry).is_file() for entry in entries)
+
+
+def cds_options(bsagio: BSAGIO, classpath: str) -> list[str]:
+    """The CDS options for a JVM with `classpath`, or none if `jh61b.cds` isn't configured or supported."""
+    archives: CdsArchives | None = bsagio.data.get(CDS_KEY)
+    return archives.java_options(classpath) if archives is not None else []
+
+
+def cds_finish(bsagio: BSAGIO, classpath: str, options: list[str], success: bool) -> None:
+    archives: CdsArchives | None = bsagio.data.get(CDS_KEY)
+    if archives is not None:
+        archives.finish(classpath, options, success)
+
+
+class Cds(BaseStepDefinition[CdsConfig]):
+    """Enables class-data sharing archives for the JVMs started by later `jh61b` steps."""
+
+    @staticmethod
+    def name() -> str:
+        return "jh61b.cds"
+
+    @classmethod
+    def display_name(cls, config: CdsConfig) -> str:
+        return "Class-Data Sharing"
+
+    @classmethod
+    def run(cls, bsagio: BSAGIO, config: CdsConfig) -> bool:
+        version_result = run_subprocess(["java", "-version"], label="java -version", timeout=30)
+        match = JAVA_VERSION_PAT.search(version_result.output + (version_result.stderr or ""))
+        if version_result.return_code != 0 or match is None or int(match.group("major")) < MIN_JAVA_VERSION:
+            bsagio.private.info("Class-data sharing archives are not supported by this JDK; skipping.")
+            return True
+
+        try:
+            config.archive_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            bsagio.private.warning(f"Unable to create CDS archive directory: {e}")
+            return True
+
+        version_line = (version_result.output + (version_result.stderr or "")).strip().splitlines()[0]
+        bsagio.data[CDS_KEY] = CdsArchives(config.archive_dir, config.create, config.max_size_mb, version_line)
+        bsagio.private.info(f"Using class-data sharing archives in {config.archive_dir}")
+        return True
@@ -1,22 +1,20 @@
+import os
 import re
 from pathlib import Path
 from subprocess import list2cmdline
 
 import pathspec
-from bsag import BaseStepConfig, BaseStepDefinition
+from bsag import BaseStepDefinition
 from bsag.bsagio import BSAGIO
-from bsag.utils.subprocesses import run_subprocess
-from pydantic import FilePath, PositiveInt
-
-WARNING_MSG_PAT = re.compile(r"^\[ERROR\]\s*(?P<error>.*)")
 
+from ._configs import CheckStyleConfig
+from ._timing import run_subprocess, timed_step
+from .cds import cds_finish, cds_options
+from .file_index import FILE_INDEX_KEY, FileIndex
 
-class CheckStyleConfig(BaseStepConfig):
-    checkstyle_jar_path: FilePath | None
-    checkstyle_xml_path: FilePath
-    submission_root: Path
-    pathspec: list[str] = ["*.java"]
-    command_timeout: PositiveInt
+WARNING_MSG_PAT = re.compile(r"^\[ERROR\]\s*(?P<error>.*)")
+# Printed once checkstyle has checked every file, so a nonzero return code without it means checkstyle halted early.
+AUDIT_DONE_MSG = "Audit done."
 
 
 class CheckStyle(BaseStepDefinition[CheckStyleConfig]):
@@ -29,42 +27,83 @@ class CheckStyle(BaseStepDefinition[CheckStyleConfig]):
         return "Style"
 
     @classmethod
+    @timed_step
     def run(cls, bsagio: BSAGIO, config: CheckStyleConfig) -> bool:
         # Need a new release of pathspec for stubs
         filespec: pathspec.PathSpec = pathspec.PathSpec.from_lines("gitwildmatch", config.pathspec)
-        files = [Path(config.submission_root, f) for f in filespec.match_tree(config.submission_root)]  # type: ignore
+        index: FileIndex | None = bsagio.data.get(FILE_INDEX_KEY)
+        if index is not None and index.indexes(config.submission_root):
+            matches = filespec.match_files(index.files(config.submission_root))  # type: ignore
+        else:
+            matches = filespec.match_tree(config.submission_root)  # type: ignore
+        files = [Path(config.submission_root, f) for f in matches]
         files.sort()
 
         bsagio.both.info(f"Running style check on {len(files)}")
 
+        if config.batch:
+            return cls._check_files(bsagio, config, files)
+
         passed = True
-        total_errors = 0
         # Run checkstyle separately for each file, because if checkstyle finds a syntax error, it halts entirely.
         for file in files:
-            style_command: list[str | Path] = ["java"]
-            if config.checkstyle_jar_path:
-                style_command += ["-jar", config.checkstyle_jar_path]
-            else:
-                style_command += ["com.puppycrawl.tools.checkstyle.Main"]
-            style_command += ["-c", config.checkstyle_xml_path, file]
-            bsagio.private.debug("\n" + list2cmdline(style_command))
-            style_result = run_subprocess(style_command, timeout=config.command_timeout)
-            if style_result.timed_out:
-                bsagio.both.error(f"Timed out while style-checking {file}.")
+            if not cls._check_files(bsagio, config, [file]):
                 passed = False
-            elif style_result.return_code != 0:
-                passed = False
-                style_errors = 0
-                for line in style_result.output.splitlines():
-                    match = WARNING_MSG_PAT.match(line)
-                    if match is None:
-                        continue
-                    style_errors += 1
-                    bsagio.student.error(match.group("error").removeprefix(str(config.submission_root)))
-                if style_errors == 0:
-                    bsagio.both.error(f"Style checking {file} failed for non-style reasons.")
-                    bsagio.private.error(style_result.output)
-                    passed = False
-                total_errors += style_errors
 
         return passed
+
+    @classmethod
+    def _check_files(cls, bsagio: BSAGIO, config: CheckStyleConfig, files: list[Path]) -> bool:
+        """Style-checks `files` in one checkstyle run.
+
+        If checkstyle finds a syntax error (or times out), it halts without checking the rest of the files, so the
+        file set is split in half and each half is checked separately until the bad file is found.
+        """
+        if not files:
+            return True
+
+        # The JVM's class path is the jar itself when run with `-jar`.
+        classpath = str(config.checkstyle_jar_path) if config.checkstyle_jar_path else os.environ.get("CLASSPATH", "")
+        cds = cds_options(bsagio, classpath)
+        style_command: list[str | Path] = ["java", *cds]
+        if config.checkstyle_jar_path:
+            style_command += ["-jar", config.checkstyle_jar_path]
+        else:
+            style_command += ["com.puppycrawl.tools.checkstyle.Main"]
+        style_command += ["-c", config.checkstyle_xml_path, *files]
+        bsagio.private.debug("\n" + list2cmdline(style_command))
+        style_result = run_subprocess(
+            style_command,
+            label=files[0].name if len(files) == 1 else f"{len(files)} files",
+            timeout=config.command_timeout * len(files),
+        )
+        cds_finish(bsagio, classpath, cds, AUDIT_DONE_MSG in style_result.output)
+
+        if len(files) > 1 and (
+            style_result.timed_out or (style_result.return_code != 0 and AUDIT_DONE_MSG not in style_result.output)
+        ):
+            bsagio.private.debug(f"Style checking {len(files)} files failed, splitting")
+            mid = len(files) // 2
+            first_passed = cls._check_files(bsagio, config, files[:mid])
+            second_passed = cls._check_files(bsagio, config, files[mid:])
+            return first_passed and second_passed
+
+        if style_result.timed_out:
+            bsagio.both.error(f"Timed out while style-checking {files[0]}.")
+            return False
+        if style_result.return_code == 0:
+            return True
+
+        style_errors = 0
+        for line in style_result.output.splitlines():
+            match = WARNING_MSG_PAT.match(line)
+            if match is None:
+                continue
+            style_errors += 1
+            bsagio.student.error(match.group("error").removeprefix(str(config.submission_root)))
+        if style_errors == 0:
+            checked = files[0] if len(files) == 1 else f"{len(files)} files"
+            bsagio.both.error(f"Style checking {checked} failed for non-style reasons.")
+            bsagio.private.error(style_result.output)
+
+        return False
@@ -1,17 +1,20 @@
+import re
 from pathlib import Path
 from subprocess import list2cmdline
 
 from bsag import BaseStepDefinition
 from bsag.bsagio import BSAGIO
-from bsag.utils.subprocesses import run_subprocess
-from pydantic import PositiveInt
 
-from ._types import PIECES_KEY, AssessmentPieces, BaseJh61bConfig, FailedPiece
+from ._compact import compact_javac_output
+from ._compile_cache import CompileCache
+from ._compile_server import run_javac
+from ._configs import CompilationConfig
+from ._timing import timed_step
+from ._types import PIECES_KEY, AssessmentPieces, FailedPiece, Piece
+from .result_cache import cached_step_result, record_step_result, recording_io, skip_saving
+from .scratch import class_root, javac_output_args
 
-
-class CompilationConfig(BaseJh61bConfig):
-    compile_flags: list[str] = []
-    command_timeout: PositiveInt | None = None
+JAVAC_ERROR_PAT = re.compile(r"^(?P<file>.+\.java):\d+: error: ", re.MULTILINE)
 
 
 class Compilation(BaseStepDefinition[CompilationConfig]):
@@ -24,34 +27,159 @@ class Compilation(BaseStepDefinition[CompilationConfig]):
         return "Compilation"
 
     @classmethod
+    @timed_step
     def run(cls, bsagio: BSAGIO, config: CompilationConfig) -> bool:
+        cached = cached_step_result(bsagio, cls.name())
+        if cached is not None:
+            return cached
+        bsagio = recording_io(bsagio, cls.name())
+
         pieces: AssessmentPieces = bsagio.data[PIECES_KEY]
         num_live_pieces = len(pieces.live_pieces)
-        for name, piece in list(pieces.live_pieces.items()):
-            bsagio.both.info(f"Compiling tests for {name}...")
-
-            compile_command: list[str | Path] = ["javac", "-encoding", "utf8", "-g"]
-            compile_command.extend(["-sourcepath", f"{config.grader_root}:{config.submission_root}"])
-            compile_command.extend(config.compile_flags)
-            compile_command.extend(piece.student_files) # to allow for reflection based tests that may not compile the student files
-            compile_command.extend(piece.assessment_files)
+
+        cache = None
+        grader_cached = False
+        if config.compile_cache_dir is not None:
+            cache = CompileCache(
+                config.compile_cache_dir,
+                config.grader_root,
+                config.compile_flags,
+                class_root(bsagio, config.grader_root),
+                config.submission_root,
+            )
+            grader_cached = cache.restore()
+            if grader_cached:
+                # Assessment classes are still passed to javac, so they are compiled against this submission; the
+                # grader classes they use are not recompiled.
+                bsagio.private.info(f"Restored grader classes from compile cache {cache.key[:12]}")
+
+        if config.batch:
+            cls._compile_batch(bsagio, config, pieces)
+        else:
+            for name in list(pieces.live_pieces):
+                cls._compile_piece(bsagio, config, pieces, name)
+
+        all_compiled = num_live_pieces == len(pieces.live_pieces)
+        if cache is not None and not grader_cached and all_compiled:
+            cache.store()
+            bsagio.private.debug(f"Saved grader classes to compile cache {cache.key[:12]}")
+
+        record_step_result(bsagio, cls.name(), all_compiled)
+        return all_compiled
+
+    @staticmethod
+    def _compile_command(bsagio: BSAGIO, config: CompilationConfig, files: list[Path]) -> list[str | Path]:
+        compile_command: list[str | Path] = ["javac", "-encoding", "utf8", "-g"]
+        compile_command.extend(["-sourcepath", f"{config.grader_root}:{config.submission_root}"])
+        restored_root = config.grader_root if config.compile_cache_dir is not None else None
+        compile_command.extend(javac_output_args(bsagio, restored_root))
+        compile_command.extend(config.compile_flags)
+        compile_command.extend(files)
+        return compile_command
+
+    @staticmethod
+    def _piece_files(piece: Piece) -> set[Path]:
+        # Student files are included to allow for reflection based tests that may not compile the student files
+        return piece.student_files | piece.assessment_files
+
+    @classmethod
+    def _compile_piece(cls, bsagio: BSAGIO, config: CompilationConfig, pieces: AssessmentPieces, name: str) -> None:
+        piece = pieces.live_pieces[name]
+        bsagio.both.info(f"Compiling tests for {name}...")
+
+        files = sorted(cls._piece_files(piece))
+        if not files:
+            bsagio.student.info("Success!")
+            return
+        compile_command = cls._compile_command(bsagio, config, files)
+        bsagio.private.debug("\n" + list2cmdline(compile_command))
+
+        compile_result = run_javac(bsagio, compile_command, config.command_timeout, config.compile_server, label=name)
+
+        if compile_result.timed_out:
+            skip_saving(bsagio, f"compiling {name} timed out")
+            bsagio.both.error("Timed out.")
+            pieces.failed_pieces[name] = FailedPiece(reason="compilation timed out")
+            del pieces.live_pieces[name]
+        elif compile_result.return_code:
+            bsagio.both.error("=========== COMPILATION ERROR =============")
+            pieces.failed_pieces[name] = FailedPiece(reason="compilation failed")
+            del pieces.live_pieces[name]
+        else:
+            bsagio.student.info("Success!")
+
+        cls._log_output(bsagio, config, compile_result.output)
+
+    @classmethod
+    def _compile_batch(cls, bsagio: BSAGIO, config: CompilationConfig, pieces: AssessmentPieces) -> None:
+        """Compiles the union of all live pieces' files at once.
+
+        javac may stop before reporting every error (e.g. after a syntax error), so pieces blamed for an error are
+        failed and the rest are compiled again, until a run succeeds. If an error can't be attributed to a piece (it is
+        in a file no piece lists, or javac failed without a diagnostic), the remaining pieces are compiled one by one.
+        """
+        remaining = dict(pieces.live_pieces)
+        while remaining:
+            bsagio.both.info(f"Compiling tests for {', '.join(remaining)}...")
+
+            files = sorted({file for piece in remaining.values() for file in cls._piece_files(piece)})
+            if not files:
+                bsagio.student.info("Success!")
+                return
+            compile_command = cls._compile_command(bsagio, config, files)
             bsagio.private.debug("\n" + list2cmdline(compile_command))
 
-            compile_result = run_subprocess(compile_command, timeout=config.command_timeout)
+            compile_result = run_javac(
+                bsagio, compile_command, config.command_timeout, config.compile_server, label="all pieces"
+            )
+
+            cls._log_output(bsagio, config, compile_result.output)
 
             if compile_result.timed_out:
-                bsagio.both.error("Timed out.")
-                pieces.failed_pieces[name] = FailedPiece(reason="compilation timed out")
-                del pieces.live_pieces[name]
-            elif compile_result.return_code:
-                bsagio.both.error("=========== COMPILATION ERROR =============")
+                skip_saving(bsagio, "batch compilation timed out")
+                bsagio.private.warning("Batch compilation timed out; compiling pieces separately")
+                break
+            if not compile_result.return_code:
+                bsagio.student.info("Success!")
+                return
+
+            blamed = cls._blame_pieces(compile_result.output, remaining)
+            if not blamed:
+                bsagio.private.warning("Unable to attribute compilation errors to pieces; compiling pieces separately")
+                break
+
+            bsagio.both.error("=========== COMPILATION ERROR =============")
+            for name in blamed:
+                bsagio.both.error(f"Compilation failed for {name}.")
                 pieces.failed_pieces[name] = FailedPiece(reason="compilation failed")
                 del pieces.live_pieces[name]
-            else:
-                bsagio.student.info("Success!")
+                del remaining[name]
 
-            if compile_result.output:
-                bsagio.student.info(compile_result.output.strip())
-                bsagio.private.info("\n" + compile_result.output.strip())
+        for name in remaining:
+            cls._compile_piece(bsagio, config, pieces, name)
 
-        return num_live_pieces == len(pieces.live_pieces)
+    @staticmethod
+    def _log_output(bsagio: BSAGIO, config: CompilationConfig, output: str) -> None:
+        output = output.strip()
+        if not output:
+            return
+        if config.max_output is not None:
+            bsagio.student.info(compact_javac_output(output, config.max_output))
+        else:
+            bsagio.student.info(output)
+        bsagio.private.info("\n" + output)
+
+    @staticmethod
+    def _blame_pieces(output: str, pieces: dict[str, Piece]) -> list[str]:
+        """Returns the pieces that list a file javac reported an error in, or none if an error can't be attributed."""
+        error_files = {Path(match.group("file")).resolve() for match in JAVAC_ERROR_PAT.finditer(output)}
+        attributed: set[Path] = set()
+        blamed: list[str] = []
+        for name, piece in pieces.items():
+            piece_errors = error_files & {file.resolve() for file in piece.student_files | piece.assessment_files}
+            if piece_errors:
+                blamed.append(name)
+                attributed |= piece_errors
+        if attributed != error_files:
+            return []
+        return blamed
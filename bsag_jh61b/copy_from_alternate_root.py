@@ -1,25 +1,64 @@
 # note: This code was entirely LLM generated and never seriously reviewed
-from pathlib import Path
+import errno
+import fcntl
+import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
 
 from bsag import BaseStepDefinition
 from bsag.bsagio import BSAGIO
 
-from ._types import BaseJh61bConfig
+from ._configs import CopyFromAlternateRootConfig
 
+# From linux/fs.h: clone a whole file's extents (copy-on-write) on filesystems that support it.
+FICLONE = 0x40049409
 
-class CopyFromAlternateRootConfig(BaseJh61bConfig):
-    """
-    Configuration for jh61b.copy_from_alternate_root.
 
-    Inherited:
-      - grader_root: Path        (unused here)
-      - submission_root: Path
+class CopyOutcome(NamedTuple):
+    src: Path
+    dst: Path
+    status: str
+    error: str | None = None
 
-    Additional:
-      - alternate_root: Path     (directory to copy files *from*)
+
+def _clone(src: Path, dst: Path) -> bool:
+    """Reflinks `src` to `dst` if it can. Returns False (leaving no `dst`) if it can't, for any reason, so that the file
+    is copied instead.
     """
-    alternate_root: Path
+    with open(src, "rb") as fsrc, open(dst, "xb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            cloned = False
+        else:
+            cloned = True
+    if not cloned:
+        dst.unlink()
+    else:
+        shutil.copystat(src, dst)
+    return cloned
+
+
+def _copy_file(src: Path, dst: Path, hardlink: bool) -> CopyOutcome:
+    """Copies `src` to `dst` unless `dst` exists, by hardlink (if asked), reflink, or a plain copy, in that order."""
+    try:
+        if dst.exists():
+            return CopyOutcome(src, dst, "existing")
+        if hardlink:
+            try:
+                os.link(src, dst)
+                return CopyOutcome(src, dst, "linked")
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+        if _clone(src, dst):
+            return CopyOutcome(src, dst, "reflinked")
+        shutil.copy2(src, dst)
+        return CopyOutcome(src, dst, "copied")
+    except Exception as e:
+        return CopyOutcome(src, dst, "failed", str(e))
 
 
 class CopyFromAlternateRoot(BaseStepDefinition[CopyFromAlternateRootConfig]):
@@ -57,43 +96,44 @@ class CopyFromAlternateRoot(BaseStepDefinition[CopyFromAlternateRootConfig]):
             # If resolve() fails, proceed best-effort.
             pass
 
-        num_copied = 0
-        num_skipped = 0
-
-        def copy_file(src: Path, dst_dir: Path) -> bool:
-            """
-            Copy a file into `dst_dir` without overwriting an existing file
-            with the same name. Returns True if copied, False if skipped.
-            """
-            dst = dst_dir / src.name
-            if dst.exists():
-                bsagio.both.info(f"Skipping existing file: {dst}")
-                return False
-            try:
-                shutil.copy2(src, dst)
-                bsagio.both.info(f"Copied {src} -> {dst}")
-                return True
-            except Exception as e:
-                bsagio.both.error(f"Failed to copy {src} -> {dst}: {e}")
-                return False
-
-        # Copy only top-level files directly under alternate_root into submission_root.
-        # (We deliberately do not descend into subdirectories.)
+        # Collect every file (and create every directory) first, so copies can run concurrently.
+        files: list[tuple[Path, Path]] = []
         try:
-            for child in alt.iterdir():
-                if child.is_file():
-                    if copy_file(child, dest_root):
-                        num_copied += 1
-                    else:
-                        num_skipped += 1
-                else:
-                    bsagio.both.info(f"Not copying directory {child}; only top-level files are copied.")
+            pending = [(alt, dest_root)]
+            # Directories already walked, so symlinks to a parent directory aren't followed forever.
+            alt_stat = alt.stat()
+            visited = {(alt_stat.st_dev, alt_stat.st_ino)}
+            while pending:
+                src_dir, dst_dir = pending.pop()
+                with os.scandir(src_dir) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            files.append((Path(entry.path), dst_dir / entry.name))
+                        elif entry.is_dir() and config.recursive:
+                            entry_stat = entry.stat()
+                            if (entry_stat.st_dev, entry_stat.st_ino) in visited:
+                                bsagio.private.debug(f"Not copying {entry.path} again; it links to a copied directory.")
+                                continue
+                            visited.add((entry_stat.st_dev, entry_stat.st_ino))
+                            Path(dst_dir, entry.name).mkdir(exist_ok=True)
+                            pending.append((Path(entry.path), dst_dir / entry.name))
+                        elif entry.is_dir():
+                            bsagio.both.info(f"Not copying directory {entry.path}; only top-level files are copied.")
         except Exception as e:
             bsagio.both.error(f"Error while scanning alternate root {alt}: {e}")
             return False
 
-        bsagio.both.info(
-            f"copy_from_alternate_root summary: copied={num_copied}, "
-            f"skipped_existing={num_skipped}, from={alt}, to={dest_root}"
-        )
+        with ThreadPoolExecutor(max_workers=config.max_workers) as executor:
+            outcomes = list(executor.map(lambda pair: _copy_file(pair[0], pair[1], config.hardlink), files))
+
+        counts: dict[str, int] = {}
+        for outcome in outcomes:
+            counts[outcome.status] = counts.get(outcome.status, 0) + 1
+            if outcome.status == "failed":
+                bsagio.both.error(f"Failed to copy {outcome.src} -> {outcome.dst}: {outcome.error}")
+            elif outcome.status == "existing":
+                bsagio.private.debug(f"Kept existing {outcome.dst} instead of copying {outcome.src}")
+
+        summary = ", ".join(f"{status}={count}" for status, count in sorted(counts.items())) or "no files"
+        bsagio.both.info(f"copy_from_alternate_root summary: {summary}, from={alt}, to={dest_root}")
         return True
@@ -1,14 +1,22 @@
+import hashlib
+import json
+import os
 import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 from pathlib import Path
 from subprocess import list2cmdline
 
 from bsag import BaseStepDefinition
 from bsag.bsagio import BSAGIO
-from bsag.utils.subprocesses import run_subprocess
-from pydantic import PositiveInt
 
-from ._types import BaseJh61bConfig
-from .java_utils import class_matches
+from ._configs import DepCheckConfig
+from ._timing import run_subprocess, timed_step
+from ._types import PIECES_KEY, AssessmentPieces
+from .java_utils import ClassPatternSet, class_file_name, submission_class_files
+from .result_cache import cached_step_result, record_step_result, recording_io, skip_saving
+from .scratch import scratch_workspace
 
 JDEPS_CLASS_DEP_PAT = re.compile(
     r"""
@@ -22,12 +30,9 @@ JDEPS_CLASS_DEP_PAT = re.compile(
     """,
     re.VERBOSE,
 )
-
-
-class DepCheckConfig(BaseJh61bConfig):
-    allowed_classes: list[str] = ["**"]
-    disallowed_classes: list[str] = []
-    command_timeout: PositiveInt | None = None
+JDEPS_FLAGS = ["--multi-release", "base", "-verbose:class"]
+# Below this many class files per jdeps run, JVM startup costs more than splitting saves.
+MIN_JDEPS_BATCH = 64
 
 
 class DepCheck(BaseStepDefinition[DepCheckConfig]):
@@ -40,19 +45,31 @@ class DepCheck(BaseStepDefinition[DepCheckConfig]):
         return "Illegal Dependency Check"
 
     @classmethod
+    @timed_step
     def run(cls, bsagio: BSAGIO, config: DepCheckConfig) -> bool:
+        cached = cached_step_result(bsagio, cls.name())
+        if cached is not None:
+            return cached
+        bsagio = recording_io(bsagio, cls.name())
+        passed = cls._check(bsagio, config)
+        record_step_result(bsagio, cls.name(), passed)
+        return passed
+
+    @classmethod
+    def _check(cls, bsagio: BSAGIO, config: DepCheckConfig) -> bool:
         bsagio.both.info("Running illegal dependency check.")
 
-        jdeps_commmand: list[str | Path] = [
-            "jdeps",
-            "--multi-release",
-            "base",
-            "-verbose:class",
-            config.submission_root,
-        ]
-        bsagio.private.debug("\n" + list2cmdline(jdeps_commmand))
-        jdeps_result = run_subprocess(jdeps_commmand, timeout=config.command_timeout)
-        if jdeps_result.timed_out:
+        if PIECES_KEY in bsagio.data:
+            pieces: AssessmentPieces = bsagio.data[PIECES_KEY]
+            class_files = cls._submission_class_files(bsagio, config)
+            if not class_files and any(piece.student_files for piece in pieces.live_pieces.values()):
+                # Otherwise a submission that was never compiled would pass.
+                bsagio.both.error("No compiled class files found for the submission.")
+                return False
+            edges = cls._class_file_edges(bsagio, config, class_files)
+        else:
+            edges = cls._jdeps_edges(bsagio, config, [config.submission_root])
+        if edges is None:
             bsagio.both.error("Timed out during illegal dependency check.")
             return False
 
@@ -60,19 +77,101 @@ class DepCheck(BaseStepDefinition[DepCheckConfig]):
         # If a class is both disallowed and allowed, the dependency check will still pass.
         # This is to allow for exceptions from java.util.* and the like.
 
+        allowed = ClassPatternSet(config.allowed_classes)
+        disallowed = ClassPatternSet(config.disallowed_classes)
+        illegal_deps: dict[str, bool] = {}
+
         passed = True
-        for line in jdeps_result.output.splitlines():
-            match = re.match(JDEPS_CLASS_DEP_PAT, line)
-            if match is None:
-                continue
-            student_class: str = match.group("class")
-            dep_target: str = match.group("dep")
+        for student_class, dep_target in dict.fromkeys(edges):
+            if dep_target not in illegal_deps:
+                illegal_deps[dep_target] = disallowed.matches(dep_target) and not allowed.matches(dep_target)
 
-            matches_allowed = [class_matches(pat, dep_target) for pat in config.allowed_classes]
-            matches_disallowed = [class_matches(pat, dep_target) for pat in config.disallowed_classes]
-            
-            if any(matches_disallowed) and not any(matches_allowed):
+            if illegal_deps[dep_target]:
                 passed = False
                 bsagio.student.error(f"Class {student_class} has illegal dependency {dep_target}")
 
         return passed
+
+    @staticmethod
+    def _submission_class_files(bsagio: BSAGIO, config: DepCheckConfig) -> list[Path]:
+        """Every class compiled from the submission, including helper files and pieces that failed to compile."""
+        workspace = scratch_workspace(bsagio)
+        sources = config.submission_root.rglob("*.java")
+        return submission_class_files(sources, workspace.class_dir if workspace is not None else None)
+
+    @classmethod
+    def _class_file_edges(
+        cls, bsagio: BSAGIO, config: DepCheckConfig, class_files: list[Path]
+    ) -> list[tuple[str, str]] | None:
+        """Runs jdeps on only the given class files, using the cache if configured."""
+        edges: list[tuple[str, str]] = []
+        uncached: list[Path] = []
+        cache_files: dict[Path, Path] = {}
+        for class_file in class_files:
+            if config.jdeps_cache_dir is not None:
+                cache_file = cls._cache_file(config.jdeps_cache_dir, class_file)
+                if cache_file.is_file():
+                    with open(cache_file, encoding="utf-8") as f:
+                        edges.extend((student_class, dep_target) for student_class, dep_target in json.load(f))
+                    continue
+                cache_files[class_file] = cache_file
+            uncached.append(class_file)
+
+        bsagio.private.debug(f"Analyzing {len(uncached)} of {len(class_files)} student class files")
+        if not uncached:
+            return edges
+
+        max_workers = config.max_workers or os.cpu_count() or 1
+        num_batches = max(1, min(max_workers, len(uncached) // MIN_JDEPS_BATCH))
+        batches = [uncached[i::num_batches] for i in range(num_batches)]
+        with ThreadPoolExecutor(max_workers=num_batches) as executor:
+            runs = [executor.submit(copy_context().run, cls._jdeps_edges, bsagio, config, batch) for batch in batches]
+            batch_edges = [run.result() for run in runs]
+
+        new_edges: list[tuple[str, str]] = []
+        for batch in batch_edges:
+            if batch is None:
+                return None
+            new_edges.extend(batch)
+
+        if cache_files:
+            edges_by_class: dict[str, list[tuple[str, str]]] = {}
+            for edge in new_edges:
+                edges_by_class.setdefault(edge[0], []).append(edge)
+            for class_file, cache_file in cache_files.items():
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp = f"{cache_file}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(edges_by_class.get(class_file_name(class_file), []), f)
+                os.replace(tmp, cache_file)
+
+        return edges + new_edges
+
+    @staticmethod
+    def _cache_file(cache_dir: Path, class_file: Path) -> Path:
+        key = hashlib.sha256()
+        jdeps = shutil.which("jdeps")
+        if jdeps is not None:
+            key.update(f"{Path(jdeps).resolve()}\0".encode())
+        key.update(f"{JDEPS_FLAGS}\0".encode())
+        key.update(class_file.read_bytes())
+        digest = key.hexdigest()
+        return Path(cache_dir, digest[:2], f"{digest}.json")
+
+    @staticmethod
+    def _jdeps_edges(bsagio: BSAGIO, config: DepCheckConfig, targets: list[Path]) -> list[tuple[str, str]] | None:
+        """Returns the (class, dependency) edges jdeps finds in `targets`, or `None` if it timed out."""
+        jdeps_commmand: list[str | Path] = ["jdeps", *JDEPS_FLAGS, *targets]
+        bsagio.private.debug("\n" + list2cmdline(jdeps_commmand))
+        jdeps_result = run_subprocess(jdeps_commmand, label="jdeps", timeout=config.command_timeout)
+        if jdeps_result.timed_out:
+            skip_saving(bsagio, "jdeps timed out")
+            return None
+
+        edges: list[tuple[str, str]] = []
+        for line in jdeps_result.output.splitlines():
+            match = JDEPS_CLASS_DEP_PAT.match(line)
+            if match is None:
+                continue
+            edges.append((match.group("class"), match.group("dep")))
+        return edges
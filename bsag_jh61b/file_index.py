@@ -0,0 +1,114 @@
+import os
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+from bsag import BaseStepDefinition
+from bsag.bsagio import BSAGIO
+
+from ._configs import FileIndexConfig
+
+FILE_INDEX_KEY = "jh61b_file_index"
+
+
+class FileIndex:
+    """The files under some roots, found with one `os.scandir` walk, as relative POSIX paths.
+
+    The index is a snapshot: files written later (such as compiled classes) aren't in it, so only source files should
+    be looked up.
+    """
+
+    def __init__(self, roots: Iterable[Path], prune: list[str]) -> None:
+        # Imported here so that `check_files` and `api`, which only look files up, don't import pathspec.
+        import pathspec
+
+        # Need a new release of pathspec for stubs
+        self._prune: pathspec.PathSpec = pathspec.PathSpec.from_lines("gitwildmatch", prune)  # type: ignore
+        self._files: dict[Path, set[str]] = {}
+        self._pruned: dict[Path, list[str]] = {}
+        for root in roots:
+            self._scan(Path(root).absolute())
+
+    def _scan(self, root: Path) -> None:
+        files: set[str] = set()
+        pruned: list[str] = []
+        pending = [""]
+        while pending:
+            rel_dir = pending.pop()
+            try:
+                with os.scandir(Path(root, rel_dir)) as entries:
+                    for entry in entries:
+                        rel = f"{rel_dir}{entry.name}"
+                        if entry.is_dir():
+                            if self._prune.match_file(f"{rel}/"):
+                                pruned.append(f"{rel}/")
+                            elif not entry.is_symlink() or not self._is_loop(Path(root, rel_dir), entry.path):
+                                pending.append(f"{rel}/")
+                        elif entry.is_file():
+                            files.add(rel)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+        self._files[root] = files
+        self._pruned[root] = pruned
+
+    @staticmethod
+    def _is_loop(directory: Path, link: str) -> bool:
+        """Whether the symlinked directory `link` in `directory` is `directory` or one of its parents. Other symlinked
+        directories are followed, as they are when walking the disk.
+        """
+        target = os.path.realpath(link)
+        current = os.path.realpath(directory)
+        return current == target or current.startswith(target.rstrip(os.sep) + os.sep)
+
+    def _locate(self, path: Path) -> tuple[Path, str] | None:
+        path = path.absolute()
+        # The innermost root, in case one root contains another.
+        for root in sorted(self._files, key=lambda r: len(r.parts), reverse=True):
+            if path.is_relative_to(root):
+                return root, path.relative_to(root).as_posix()
+        return None
+
+    def is_file(self, path: Path) -> bool:
+        """`path.is_file()`, from the index if `path` is under an indexed root and not under a pruned directory."""
+        located = self._locate(path)
+        if located is None:
+            return path.is_file()
+        root, rel = located
+        if any(rel.startswith(pruned) for pruned in self._pruned[root]):
+            return path.is_file()
+        return rel in self._files[root]
+
+    def indexes(self, root: Path) -> bool:
+        return Path(root).absolute() in self._files
+
+    def files(self, root: Path) -> list[str]:
+        """The files under an indexed `root` (outside pruned directories), relative to it and sorted."""
+        return sorted(self._files[Path(root).absolute()])
+
+
+def is_file_checker(bsagio: BSAGIO) -> Callable[[Path], bool]:
+    """`FileIndex.is_file` if `jh61b.file_index` ran, otherwise `Path.is_file`."""
+    index: FileIndex | None = bsagio.data.get(FILE_INDEX_KEY)
+    return index.is_file if index is not None else Path.is_file
+
+
+class IndexFiles(BaseStepDefinition[FileIndexConfig]):
+    """Indexes the grader and submission trees once, for later steps to look files up in instead of the disk.
+
+    Run it after any step that adds files to either tree, such as `jh61b.copy_from_alternate_root`.
+    """
+
+    @staticmethod
+    def name() -> str:
+        return "jh61b.file_index"
+
+    @classmethod
+    def display_name(cls, config: FileIndexConfig) -> str:
+        return "File Index"
+
+    @classmethod
+    def run(cls, bsagio: BSAGIO, config: FileIndexConfig) -> bool:
+        index = FileIndex([config.grader_root, config.submission_root], config.prune)
+        bsagio.data[FILE_INDEX_KEY] = index
+        for root in (config.grader_root, config.submission_root):
+            bsagio.private.debug(f"Indexed {len(index.files(root))} files under {root}")
+        return True
@@ -1,22 +1,10 @@
-from typing import NamedTuple
-
-from bsag import BaseStepConfig, BaseStepDefinition
+from bsag import BaseStepDefinition
 from bsag.bsagio import BSAGIO
 from bsag.steps.gradescope import RESULTS_KEY, Results, TestResult
 
-from ._types import TEST_RESULTS_KEY, Jh61bResults
-
-
-class FinalScoreConfig(BaseStepConfig):
-    max_points: float
-    scoring: dict[str, float]
-    scale_factor: float = 1
-    penalties: dict[str, float] = {}
-
-
-class Score(NamedTuple):
-    score: float
-    max_score: float
+from ._compact import compact_output, output_budgets
+from ._configs import FinalScoreConfig
+from ._types import STEP_LOGS_KEY, TEST_RESULTS_KEY, Jh61bResults
 
 
 class FinalScore(BaseStepDefinition[FinalScoreConfig]):
@@ -30,28 +18,34 @@ class FinalScore(BaseStepDefinition[FinalScoreConfig]):
 
     @classmethod
     def run(cls, bsagio: BSAGIO, config: FinalScoreConfig) -> bool:
+        # NumPy is only imported once scores are computed, so it doesn't slow down loading the step.
+        from .scoring import rescale_tests, score_batch
+
         res: Results = bsagio.data[RESULTS_KEY]
 
         # I'm aware this is weird, but something in pylance does not like get with default
         if TEST_RESULTS_KEY in bsagio.data:
-           test_results: dict[str, Jh61bResults] = bsagio.data[TEST_RESULTS_KEY]
+            test_results: dict[str, Jh61bResults] = bsagio.data[TEST_RESULTS_KEY]
         else:
             test_results: dict[str, Jh61bResults] = {}
 
-        subscores = {
-            piece: result.score / result.max_score if result.max_score > 0 else 0.0
-            for piece, result in test_results.items()
-        }
-
-        # Reweight scores
-        total_weight = sum(config.scoring.values())
-        weighted_scores: dict[str, Score] = {}
-        for piece, score in subscores.items():
-            weight = config.scoring.get(piece, 0)
-            max_subscore = weight / total_weight * config.max_points
-            weighted_scores[piece] = Score(score * max_subscore, max_subscore)
-
-        missing_scores = set(config.scoring.keys()) - set(subscores)
+        pieces = list(test_results)
+        # Penalties apply to failed steps in step order, then to those run inside other steps (`jh61b.parallel`).
+        step_logs = [*bsagio.step_logs, *bsagio.data.get(STEP_LOGS_KEY, [])]
+        penalized_steps = [
+            step_log for step_log in step_logs if not step_log.success and step_log.name in config.penalties
+        ]
+        batch = score_batch(
+            [[test_results[piece].score for piece in pieces]],
+            [[test_results[piece].max_score for piece in pieces]],
+            [config.scoring.get(piece, 0) for piece in pieces],
+            config.max_points,
+            config.scale_factor,
+            total_weight=sum(config.scoring.values()),
+            penalty_fractions=[[config.penalties[step_log.name] for step_log in penalized_steps]],
+        )
+
+        missing_scores = set(config.scoring.keys()) - set(pieces)
         if missing_scores:
             bsagio.private.error(f"Missing piece scores for: {missing_scores}")
 
@@ -61,33 +55,35 @@ class FinalScore(BaseStepDefinition[FinalScoreConfig]):
                 "total perfection for full credit. Your score may not exceed the max."
             )
 
-        total_score = sum(scores[0] for scores in weighted_scores.values())
-        total_score *= config.scale_factor
-        total_score = min(config.max_points, total_score)
-
-        # Apply penalties
-        total_penalty = 0.0
-        if config.penalties:
-            for step_log in bsagio.step_logs:
-                if not step_log.success and step_log.name in config.penalties:
-                    penalty = config.penalties[step_log.name] * total_score
-                    step_log.score = -penalty
-                    total_penalty += penalty
+        for step_log, penalty in zip(penalized_steps, batch.penalties[0], strict=True):
+            step_log.score = -float(penalty)
 
-        final_score = total_score - total_penalty
+        final_score = float(batch.final_scores[0])
         bsagio.private.info(f"Final score post-scaling: {final_score:.3f} / {config.max_points:.3f}")
         res.score = final_score
 
         # Rescale Jh61bResults
+        tests = [test for piece in pieces for test in test_results[piece].tests]
+        test_pieces = [i for i, piece in enumerate(pieces) for _ in test_results[piece].tests]
+        test_scores = rescale_tests([[test.score or 0.0 for test in tests]], test_pieces, batch.rescale)
+        test_max_scores = rescale_tests([[test.max_score or 0.0 for test in tests]], test_pieces, batch.rescale)
         rescaled_tests: list[TestResult] = []
-        for piece, result in test_results.items():
-            rescale = weighted_scores[piece].max_score / result.max_score if result.max_score > 0 else 0.0
-            for test in result.tests:
-                test.score = rescale * test.score if test.score else 0.0
-                test.max_score = rescale * test.max_score if test.max_score else 0.0
-                rescaled_tests.append(test)
+        for test, score, max_score in zip(tests, test_scores[0], test_max_scores[0], strict=True):
+            test.score = float(score)
+            test.max_score = float(max_score)
+            rescaled_tests.append(test)
 
         rescaled_tests.sort(key=lambda t: t.number if t.number is not None else f"_{t.name}")
+        if config.max_results_output is not None:
+            cls._compact_outputs(bsagio, rescaled_tests, config.max_results_output)
         res.tests.extend(rescaled_tests)
 
         return True
+
+    @staticmethod
+    def _compact_outputs(bsagio: BSAGIO, tests: list[TestResult], max_total: int) -> None:
+        budgets = output_budgets([len(test.output or "") for test in tests], max_total)
+        for test, budget in zip(tests, budgets, strict=True):
+            if test.output is not None and len(test.output) > budget:
+                bsagio.private.debug(f"Full output of {test.name}:\n{test.output}")
+                test.output = compact_output(test.output, budget)
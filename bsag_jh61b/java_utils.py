@@ -1,5 +1,37 @@
+import re
+import struct
+from collections.abc import Iterable
 from pathlib import Path
 
+# Sizes of the fixed-size constant pool entries, by tag. Utf8 (1) is variable-length; Long (5) and Double (6) take up
+# two constant pool slots.
+_CONSTANT_SIZES = {
+    3: 4,
+    4: 4,
+    5: 8,
+    6: 8,
+    7: 2,
+    8: 2,
+    9: 4,
+    10: 4,
+    11: 4,
+    12: 4,
+    15: 3,
+    16: 2,
+    17: 4,
+    18: 4,
+    19: 2,
+    20: 2,
+}
+
+JAVA_TOKEN_PAT = re.compile(
+    r'//[^\n]*|/\*.*?\*/|""".*?"""|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|[{};]|[^{};"\'/]+|/', re.DOTALL
+)
+# A type declaration keyword followed by the type's name (a method named `record` is followed by its parameters).
+TYPE_DECLARATION_PAT = re.compile(r"(?<![\w$])(class|interface|enum|record)\s+[\w$]")
+# Identifiers after `.` or `(`, such as `Foo.class` or `record` as an argument, are never declaration keywords.
+MEMBER_OR_ARGUMENT_PAT = re.compile(r"(?<=[.(])\s*[\w$]+")
+
 
 def class_matches(pat: str, cl: str) -> bool:
     """Checks if the pattern `pat` matches the fully qualified Java class `cl`.
@@ -29,8 +61,185 @@ def class_matches(pat: str, cl: str) -> bool:
     return len(pat_chunks) == len(cl_chunks)
 
 
+class _PatternNode:
+    __slots__ = ("children", "terminal")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _PatternNode] = {}
+        self.terminal = False
+
+
+class ClassPatternSet:
+    """A set of `class_matches` patterns, compiled once into a trie of package segments.
+
+    `patterns.matches(cl)` is equivalent to `any(class_matches(pat, cl) for pat in patterns)`, but shares work between
+    patterns with a common prefix and splits `cl` only once.
+    """
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self._root = _PatternNode()
+        for pat in patterns:
+            node = self._root
+            for chunk in pat.strip().split("."):
+                node = node.children.setdefault(chunk, _PatternNode())
+            node.terminal = True
+
+    def matches(self, cl: str) -> bool:
+        return self._matches(self._root, cl.strip().split("."), 0)
+
+    def _matches(self, node: _PatternNode, cl_chunks: list[str], i: int) -> bool:
+        if i == len(cl_chunks):
+            return node.terminal
+
+        cl_chunk = cl_chunks[i]
+        # As in `class_matches`, a literal `**` chunk in the class is compared for equality rather than globbed.
+        if cl_chunk != "**" and "**" in node.children:
+            return True
+        child = node.children.get(cl_chunk)
+        if child is not None and self._matches(child, cl_chunks, i + 1):
+            return True
+        star = node.children.get("*")
+        return cl_chunk != "*" and star is not None and self._matches(star, cl_chunks, i + 1)
+
+
 def path_to_classname(path: Path) -> str:
     """
     Converts a filesystem path into a java classname. Intended to be used on relative paths.
     """
     return str(path).replace("/", ".").removesuffix(".java")
+
+
+def source_package(source: str) -> str:
+    """The package a Java source declares, or `""` for the default package."""
+    for match in JAVA_TOKEN_PAT.finditer(source):
+        token = match.group()
+        if token.startswith(("//", "/*")) or token.isspace():
+            continue
+        words = token.split()
+        return words[1] if len(words) == 2 and words[0] == "package" else ""
+    return ""
+
+
+def submission_class_files(sources: Iterable[Path], class_root: Path | None = None) -> list[Path]:
+    """
+    Lists every class file compiled from `sources`, including nested, anonymous and extra top-level classes, by the
+    source file each class file records. Without a `class_root`, class files are looked for next to their sources (as
+    javac writes them without `-d`); with one, under their package directory in `class_root`.
+    """
+    sources_by_dir: dict[Path, set[str]] = {}
+    for source in sources:
+        if class_root is None:
+            class_dir = source.parent
+        else:
+            package = source_package(source.read_text(encoding="utf-8", errors="replace"))
+            class_dir = Path(class_root, *package.split(".")) if package else class_root
+        sources_by_dir.setdefault(class_dir, set()).add(source.name)
+
+    return sorted(
+        class_file
+        for class_dir, names in sources_by_dir.items()
+        for class_file in class_dir.glob("*.class")
+        if _read_class_file(class_file)[1] in names
+    )
+
+
+def source_api(source: str) -> str:
+    """The declarations in a Java source that other classes can compile against, one per line.
+
+    Method and initializer bodies are dropped, as are private members, so two sources with the same `source_api` compile
+    other classes identically. Field initializers are kept, since constants are inlined into the classes using them.
+    """
+    declarations: list[str] = []
+    current: list[str] = []
+    # Nesting depth inside a block of code (a method or initializer body), which is skipped.
+    skip_depth = 0
+
+    def declare(text: str) -> None:
+        words = " ".join(text.split())
+        if words and "private" not in words.split("(")[0].split("=")[0].split():
+            declarations.append(words)
+
+    for match in JAVA_TOKEN_PAT.finditer(source):
+        token = match.group()
+        if token.startswith(("//", "/*")):
+            continue
+        if skip_depth:
+            skip_depth += {"{": 1, "}": -1}.get(token, 0)
+            continue
+        if token == "{":
+            header = "".join(current)
+            current = []
+            if TYPE_DECLARATION_PAT.search(MEMBER_OR_ARGUMENT_PAT.sub("", header)):
+                declare(header + " {")
+            else:
+                declare(header + " {}")
+                skip_depth = 1
+        elif token == "}":
+            declare("".join(current))
+            current = []
+            declarations.append("}")
+        elif token == ";":
+            declare("".join(current) + ";")
+            current = []
+        else:
+            current.append(token)
+    return "\n".join(declarations)
+
+
+def class_file_name(path: Path) -> str:
+    """Reads the fully qualified name (e.g. `java.util.Map$Entry`) of the class defined by a class file."""
+    return _read_class_file(path)[0]
+
+
+def _read_class_file(path: Path) -> tuple[str, str | None]:
+    """Reads the fully qualified name of the class defined by a class file, and the name of the source file it was
+    compiled from (if recorded).
+    """
+    data = path.read_bytes()
+    (constant_count,) = struct.unpack_from(">H", data, 8)
+    offset = 10
+    utf8: dict[int, str] = {}
+    class_names: dict[int, int] = {}
+    index = 1
+    while index < constant_count:
+        tag = data[offset]
+        if tag == 1:
+            (length,) = struct.unpack_from(">H", data, offset + 1)
+            utf8[index] = data[offset + 3 : offset + 3 + length].decode("utf-8", errors="replace")
+            offset += 3 + length
+        else:
+            if tag == 7:
+                (class_names[index],) = struct.unpack_from(">H", data, offset + 1)
+            offset += 1 + _CONSTANT_SIZES[tag]
+        index += 2 if tag in (5, 6) else 1
+
+    (this_class,) = struct.unpack_from(">H", data, offset + 2)
+    name = utf8[class_names[this_class]].replace("/", ".")
+
+    # Skip the access flags, this and super class, interfaces, fields and methods to reach the class attributes.
+    (interface_count,) = struct.unpack_from(">H", data, offset + 6)
+    offset += 8 + 2 * interface_count
+    for _ in range(2):
+        (member_count,) = struct.unpack_from(">H", data, offset)
+        offset += 2
+        for _ in range(member_count):
+            offset = _skip_attributes(data, offset + 6)
+
+    (attribute_count,) = struct.unpack_from(">H", data, offset)
+    offset += 2
+    for _ in range(attribute_count):
+        name_index, length = struct.unpack_from(">HI", data, offset)
+        if utf8.get(name_index) == "SourceFile":
+            (source_index,) = struct.unpack_from(">H", data, offset + 6)
+            return name, utf8[source_index]
+        offset += 6 + length
+    return name, None
+
+
+def _skip_attributes(data: bytes, offset: int) -> int:
+    (attribute_count,) = struct.unpack_from(">H", data, offset)
+    offset += 2
+    for _ in range(attribute_count):
+        (length,) = struct.unpack_from(">I", data, offset + 2)
+        offset += 6 + length
+    return offset
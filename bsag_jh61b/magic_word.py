@@ -4,12 +4,7 @@ from pathlib import Path
 from bsag import BaseStepDefinition
 from bsag.bsagio import BSAGIO
 
-from ._types import BaseJh61bConfig
-
-
-class MagicWordConfig(BaseJh61bConfig):
-    magic_word_path: Path = Path("magic_word.txt")
-    magic_word_regex: str | list[str] = []
+from ._configs import MagicWordConfig
 
 
 class MagicWord(BaseStepDefinition[MagicWordConfig]):
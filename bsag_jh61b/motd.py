@@ -1,14 +1,11 @@
 import random
 
 import yaml
-from bsag import BaseStepConfig, BaseStepDefinition
+from bsag import BaseStepDefinition
 from bsag.bsagio import BSAGIO
 from bsag.steps.gradescope import METADATA_KEY, RESULTS_KEY, Results, SubmissionMetadata
-from pydantic import FilePath
 
-
-class MotdConfig(BaseStepConfig):
-    path: FilePath
+from ._configs import MotdConfig
 
 
 class Motd(BaseStepDefinition[MotdConfig]):
@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import cast
+
+from bsag import BaseStepConfig, BaseStepDefinition, ParamBaseStep
+from bsag.bsagio import BSAGIO
+
+from ._buffered_io import BufferedBSAGIO
+from ._configs import ParallelConfig
+from ._timing import TIMINGS_KEY
+from ._types import STEP_LOGS_KEY, StepLog
+
+
+class Parallel(BaseStepDefinition[ParallelConfig]):
+    """Runs independent `jh61b` steps concurrently: the read-only `api`, `checkstyle` and `dep_check`, and `assessment`
+    (which only writes its test results).
+
+    Each step's logs are buffered and replayed in the declared order. Each step's outcome is added to
+    `bsagio.data[STEP_LOGS_KEY]`, so `jh61b.final_score` penalizes it as if it had run on its own. This step succeeds
+    if every step does.
+    """
+
+    @staticmethod
+    def name() -> str:
+        return "jh61b.parallel"
+
+    @classmethod
+    def display_name(cls, config: ParallelConfig) -> str:
+        return "Parallel Steps"
+
+    @classmethod
+    def run(cls, bsagio: BSAGIO, config: ParallelConfig) -> bool:
+        from ._registry import step_definitions
+
+        definitions = step_definitions()
+        steps = [(name, definitions[name], step_config) for name, step_config in config.step_configs]
+
+        # Steps share `bsagio.data`; create the dicts they add to, so concurrent steps don't replace each other's.
+        bsagio.data.setdefault(TIMINGS_KEY, {})
+        bsagio.data.setdefault(STEP_LOGS_KEY, [])
+
+        with ThreadPoolExecutor(max_workers=config.max_workers or len(steps)) as executor:
+            runs = [
+                executor.submit(copy_context().run, cls._run_step, bsagio, name, step, step_config)
+                for name, step, step_config in steps
+            ]
+            outcomes = [run.result() for run in runs]
+
+        all_success = True
+        for step_io, step_log in outcomes:
+            bsagio.private.info(f"{step_log.name}: {'passed' if step_log.success else 'failed'}")
+            step_io.replay(bsagio)
+            bsagio.data[STEP_LOGS_KEY].append(step_log)
+            all_success = all_success and step_log.success
+        return all_success
+
+    @staticmethod
+    def _run_step(
+        bsagio: BSAGIO, name: str, step: type[ParamBaseStep], step_config: BaseStepConfig
+    ) -> tuple[BufferedBSAGIO, StepLog]:
+        step_io = BufferedBSAGIO(bsagio.data, bsagio.step_logs)
+        start = time.monotonic()
+        try:
+            success = step.run(cast(BSAGIO, step_io), step_config)
+        except Exception as e:  # noqa: BLE001
+            step_io.private.error(f"{name} raised {e!r}")
+            success = False
+        return step_io, StepLog(name=name, success=success, elapsed=time.monotonic() - start)
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, cast
+
+from bsag import BaseStepDefinition
+from bsag.bsagio import BSAGIO
+from bsag.steps.gradescope import METADATA_KEY
+from pydantic import BaseModel
+
+from ._buffered_io import BufferedLogger, LogRecord
+from ._configs import ResultCacheConfig
+from ._types import PIECES_KEY, TEST_RESULTS_KEY, AssessmentPieces, Jh61bResults
+
+RESULT_CACHE_KEY = "jh61b_result_cache"
+
+
+class CachedRun(BaseModel):
+    pieces: AssessmentPieces
+    test_results: dict[str, Jh61bResults] = {}
+    step_success: dict[str, bool] = {}
+    # What each step showed students, replayed on a hit.
+    step_output: dict[str, list[LogRecord]] = {}
+
+
+class ResultCacheState(BaseModel):
+    cache_dir: Path
+    max_size_mb: int
+    key: str
+    hit: bool
+    run: CachedRun
+    # Set when something that may not happen again (such as a timeout) affected this run, which is then not saved.
+    skip_reason: str | None = None
+
+
+def _hash_file(tree_hash: "hashlib._Hash", path: Path, root: Path) -> None:
+    tree_hash.update(f"{path.relative_to(root)}\0".encode())
+    tree_hash.update(hashlib.sha256(path.read_bytes()).digest())
+
+
+class ResultCache(BaseStepDefinition[ResultCacheConfig]):
+    """Replays the results of a previous grading run when the submission, grader and config are unchanged.
+
+    Must run after `jh61b.check_files`. On a hit, `jh61b.compilation`, `jh61b.dep_check` and `jh61b.assessment` replay
+    their cached outcome and student output without running; otherwise `jh61b.assessment` saves this run (including
+    the steps before it) for next time.
+    """
+
+    @staticmethod
+    def name() -> str:
+        return "jh61b.result_cache"
+
+    @classmethod
+    def display_name(cls, config: ResultCacheConfig) -> str:
+        return "Result Cache"
+
+    @classmethod
+    def run(cls, bsagio: BSAGIO, config: ResultCacheConfig) -> bool:
+        pieces: AssessmentPieces = bsagio.data[PIECES_KEY]
+        key = cls._key(bsagio, config, pieces)
+
+        cached_path = Path(config.cache_dir, f"{key}.json")
+        state = ResultCacheState(
+            cache_dir=config.cache_dir, max_size_mb=config.max_size_mb, key=key, hit=False, run=CachedRun(pieces=pieces)
+        )
+        if cached_path.is_file():
+            state.run = CachedRun.parse_file(cached_path)
+            state.hit = True
+            # Mark as recently used for eviction.
+            os.utime(cached_path)
+            bsagio.data[PIECES_KEY] = state.run.pieces
+            bsagio.data[TEST_RESULTS_KEY] = state.run.test_results
+            bsagio.private.info(f"Using cached results {key[:12]}; skipping compilation and assessment")
+        else:
+            bsagio.private.debug(f"No cached results for {key[:12]}")
+
+        bsagio.data[RESULT_CACHE_KEY] = state
+        return True
+
+    @staticmethod
+    def _key(bsagio: BSAGIO, config: ResultCacheConfig, pieces: AssessmentPieces) -> str:
+        key_hash = hashlib.sha256()
+        key_hash.update(config.json().encode())
+        key_hash.update(pieces.json().encode())
+        # Assessments are given the names and emails of the submission's users. The rest of the metadata (such as the
+        # submission time and ID) changes with every resubmission, so it's left out.
+        metadata = bsagio.data.get(METADATA_KEY)
+        users = [[user.name, user.email] for user in metadata.users] if metadata is not None else []
+        key_hash.update(json.dumps(users).encode())
+
+        student_files = sorted({file for piece in pieces.live_pieces.values() for file in piece.student_files})
+        for file in student_files:
+            _hash_file(key_hash, file, config.submission_root)
+
+        # Compilation writes class files into the grader root, so only its sources and data are hashed.
+        for file in sorted(config.grader_root.rglob("*")):
+            if file.is_file() and file.suffix != ".class":
+                _hash_file(key_hash, file, config.grader_root)
+
+        for file in config.key_files:
+            key_hash.update(hashlib.sha256(file.read_bytes()).digest())
+        return key_hash.hexdigest()
+
+
+class _TeeLogger(BufferedLogger):
+    def __init__(self, logger: Any, records: list[LogRecord], channel: str) -> None:
+        super().__init__(records, channel)
+        self._logger = logger
+
+    def _log(self, level: str, message: str) -> None:
+        super()._log(level, message)
+        getattr(self._logger, level)(message)
+
+
+class _RecordingIO:
+    """Passes everything through to a `BSAGIO`, keeping a copy of what is shown to students."""
+
+    def __init__(self, bsagio: BSAGIO, records: list[LogRecord]) -> None:
+        self._bsagio = bsagio
+        self.student = _TeeLogger(bsagio.student, records, "student")
+        self.both = _TeeLogger(bsagio.both, records, "both")
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._bsagio, attr)
+
+
+def cached_step_result(bsagio: BSAGIO, step_name: str) -> bool | None:
+    """Returns the cached outcome of `step_name`, after replaying its student output, if the result cache hit.
+    Otherwise returns `None`.
+    """
+    state: ResultCacheState | None = bsagio.data.get(RESULT_CACHE_KEY)
+    if state is None or not state.hit or step_name not in state.run.step_success:
+        return None
+    bsagio.private.info(f"Using cached outcome of {step_name}")
+    for record in state.run.step_output.get(step_name, []):
+        getattr(getattr(bsagio, record.channel), record.level)(record.message)
+    return state.run.step_success[step_name]
+
+
+def recording_io(bsagio: BSAGIO, step_name: str) -> BSAGIO:
+    """Returns `bsagio`, recording what `step_name` shows students for the result cache if this run will be saved."""
+    state: ResultCacheState | None = bsagio.data.get(RESULT_CACHE_KEY)
+    if state is None or state.hit:
+        return bsagio
+    records = state.run.step_output[step_name] = []
+    return cast(BSAGIO, _RecordingIO(bsagio, records))
+
+
+def record_step_result(bsagio: BSAGIO, step_name: str, success: bool) -> None:
+    state: ResultCacheState | None = bsagio.data.get(RESULT_CACHE_KEY)
+    if state is not None and not state.hit:
+        state.run.step_success[step_name] = success
+
+
+def skip_saving(bsagio: BSAGIO, reason: str) -> None:
+    """Keeps this run out of the result cache, since `reason` (such as a timeout) may not happen on a rerun."""
+    state: ResultCacheState | None = bsagio.data.get(RESULT_CACHE_KEY)
+    if state is not None and not state.hit and state.skip_reason is None:
+        state.skip_reason = reason
+
+
+def save_cached_run(bsagio: BSAGIO) -> None:
+    """Saves this run's results for its cache key, then evicts least recently used entries over the size limit."""
+    state: ResultCacheState | None = bsagio.data.get(RESULT_CACHE_KEY)
+    if state is None or state.hit:
+        return
+    if state.skip_reason is not None:
+        bsagio.private.info(f"Not saving results to cache, since {state.skip_reason}")
+        return
+
+    state.run.pieces = bsagio.data[PIECES_KEY]
+    state.run.test_results = bsagio.data.get(TEST_RESULTS_KEY, {})
+    state.cache_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=state.cache_dir, prefix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(state.run.json())
+    os.replace(tmp, Path(state.cache_dir, f"{state.key}.json"))
+    bsagio.private.debug(f"Saved results to cache as {state.key[:12]}")
+
+    entries = sorted((entry.stat().st_mtime, entry.stat().st_size, entry) for entry in state.cache_dir.glob("*.json"))
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, entry in entries:
+        if total_size <= state.max_size_mb * 1024 * 1024:
+            break
+        entry.unlink(missing_ok=True)
+        total_size -= size
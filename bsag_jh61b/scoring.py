@@ -0,0 +1,79 @@
+"""Score aggregation for `jh61b.final_score`, over many submissions at once.
+
+Arrays are indexed by submission, then piece (or test, or penalty). A piece a submission has no results for has a score
+and max score of 0, which contributes nothing, as in `jh61b.final_score`. Sums are taken in column order with
+`cumsum` rather than NumPy's pairwise `sum`, so results are bit-for-bit identical to adding them up one at a time.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import numpy.typing as npt
+
+FloatArray = npt.NDArray[np.float64]
+
+
+class BatchScores(NamedTuple):
+    # (submissions,) scores after scaling, capping and penalties.
+    final_scores: FloatArray
+    # (submissions,) scores after scaling and capping, before penalties.
+    total_scores: FloatArray
+    # (submissions, penalties) points taken off for each penalty.
+    penalties: FloatArray
+    # (pieces,) points each piece is worth.
+    piece_max_scores: FloatArray
+    # (submissions, pieces) factor from a piece's raw test points to its share of the final score.
+    rescale: FloatArray
+
+
+def _sequential_sum(values: FloatArray) -> FloatArray:
+    if values.shape[-1] == 0:
+        return np.zeros(values.shape[:-1])
+    return np.cumsum(values, axis=-1)[..., -1]
+
+
+def score_batch(
+    scores: npt.ArrayLike,
+    max_scores: npt.ArrayLike,
+    weights: npt.ArrayLike,
+    max_points: float,
+    scale_factor: float = 1,
+    total_weight: float | None = None,
+    penalty_fractions: npt.ArrayLike | None = None,
+) -> BatchScores:
+    """Weights each piece's raw score to its share of `max_points`, then scales, caps and applies penalties.
+
+    `weights` are the pieces' weights, and `total_weight` (by default their sum) what they are relative to.
+    `penalty_fractions[s, k]` is the fraction of its total that submission `s` loses to penalty `k` (0 if it doesn't
+    apply); each is taken from the total before any penalties.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    max_scores = np.asarray(max_scores, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    if total_weight is None:
+        total_weight = float(_sequential_sum(weights))
+    if total_weight <= 0:
+        msg = f"Piece weights must add up to more than 0, not {total_weight}"
+        raise ValueError(msg)
+
+    has_max = max_scores > 0
+    safe_max = np.where(has_max, max_scores, 1)
+    subscores = np.where(has_max, scores / safe_max, 0.0)
+
+    piece_max_scores = weights / total_weight * max_points
+    total_scores = _sequential_sum(subscores * piece_max_scores)
+    total_scores = np.minimum(max_points, total_scores * scale_factor)
+
+    if penalty_fractions is None:
+        penalties = np.zeros((len(total_scores), 0))
+    else:
+        penalties = np.asarray(penalty_fractions, dtype=np.float64) * total_scores[:, np.newaxis]
+    final_scores = total_scores - _sequential_sum(penalties)
+
+    rescale = np.where(has_max, piece_max_scores / safe_max, 0.0)
+    return BatchScores(final_scores, total_scores, penalties, piece_max_scores, rescale)
+
+
+def rescale_tests(test_scores: npt.ArrayLike, test_pieces: npt.ArrayLike, rescale: FloatArray) -> FloatArray:
+    """Rescales raw test points (`[submission, test]`, 0 for none) by their piece's factor (`test_pieces[test]`)."""
+    return rescale[:, np.asarray(test_pieces, dtype=np.intp)] * np.asarray(test_scores, dtype=np.float64)
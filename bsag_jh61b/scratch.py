@@ -0,0 +1,148 @@
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from bsag import BaseStepDefinition
+from bsag.bsagio import BSAGIO
+
+from ._configs import ScratchConfig
+
+SCRATCH_KEY = "jh61b_scratch"
+RAM_DIR = Path("/dev/shm")
+
+
+class ScratchWorkspace:
+    """A temporary directory for build output and result files, removed when the grading run exits.
+
+    Compiled classes go to `class_dir` rather than next to their sources. Result files are handed out from a pool, so
+    pieces reuse the same few files instead of creating one each.
+    """
+
+    def __init__(self, parent: Path | None) -> None:
+        self._dir = tempfile.TemporaryDirectory(prefix="jh61b-scratch", dir=parent)
+        self.root = Path(self._dir.name)
+        self.class_dir = Path(self.root, "classes")
+        self.class_dir.mkdir()
+        self.result_root = Path(self.root, "results")
+        self.result_root.mkdir()
+        self._free: list[Path] = []
+        self._lock = threading.Lock()
+        atexit.register(self.cleanup)
+
+    @contextmanager
+    def result_file(self) -> Iterator[Path]:
+        """Yields an empty file that no other run is using."""
+        with self._lock:
+            path = self._free.pop() if self._free else None
+        if path is None:
+            fd, name = tempfile.mkstemp(suffix=".json", prefix="assess", dir=self.result_root)
+            os.close(fd)
+            path = Path(name)
+        try:
+            yield path
+        finally:
+            try:
+                os.truncate(path, 0)
+            except OSError:
+                pass
+            else:
+                with self._lock:
+                    self._free.append(path)
+
+    def cleanup(self) -> None:
+        atexit.unregister(self.cleanup)
+        self._dir.cleanup()
+
+
+def scratch_workspace(bsagio: BSAGIO) -> ScratchWorkspace | None:
+    return bsagio.data.get(SCRATCH_KEY)
+
+
+def class_root(bsagio: BSAGIO, source_root: Path) -> Path:
+    """Where the classes compiled from `source_root` are: the scratch class directory, or next to the sources."""
+    workspace = scratch_workspace(bsagio)
+    return workspace.class_dir if workspace is not None else source_root
+
+
+def with_class_dir(bsagio: BSAGIO, classpath: str) -> str:
+    """`classpath`, led by the scratch class directory if there is one."""
+    workspace = scratch_workspace(bsagio)
+    return f"{workspace.class_dir}:{classpath}" if workspace is not None else classpath
+
+
+def javac_output_args(bsagio: BSAGIO, restored_root: Path | None = None) -> list[str | Path]:
+    """javac arguments to write classes to the scratch class directory, and find those already compiled there.
+
+    Without a scratch workspace, classes are written next to their sources; pass `restored_root` if classes (e.g. from
+    a compile cache) were restored next to sources that are only on the `-sourcepath`, so javac finds them.
+    """
+    workspace = scratch_workspace(bsagio)
+    if workspace is None:
+        if restored_root is None:
+            return []
+        # javac otherwise uses $CLASSPATH (or the working directory), so it is kept.
+        return ["-classpath", f"{restored_root}:{os.environ.get('CLASSPATH', '.')}"]
+    # javac otherwise uses $CLASSPATH, so it is kept.
+    classpath = ":".join(str(entry) for entry in [workspace.class_dir, os.environ.get("CLASSPATH")] if entry)
+    return ["-d", workspace.class_dir, "-classpath", classpath]
+
+
+@contextmanager
+def result_file(bsagio: BSAGIO) -> Iterator[Path]:
+    """Yields an empty file for a JVM to write results to, from the scratch workspace if there is one."""
+    workspace = scratch_workspace(bsagio)
+    if workspace is not None:
+        with workspace.result_file() as path:
+            yield path
+        return
+
+    fd, name = tempfile.mkstemp(suffix=".json", prefix="assess")
+    os.close(fd)
+    try:
+        yield Path(name)
+    finally:
+        os.unlink(name)
+
+
+@contextmanager
+def result_dir(bsagio: BSAGIO) -> Iterator[Path]:
+    """Yields an empty directory for a JVM to write results to, from the scratch workspace if there is one."""
+    workspace = scratch_workspace(bsagio)
+    outdir = tempfile.mkdtemp(prefix="assess", dir=workspace.result_root if workspace is not None else None)
+    try:
+        yield Path(outdir)
+    finally:
+        shutil.rmtree(outdir, ignore_errors=True)
+
+
+class Scratch(BaseStepDefinition[ScratchConfig]):
+    """Creates a scratch workspace, in RAM where possible, for the build output and result files of later steps.
+
+    Run it before `jh61b.compilation`. Classes are then compiled into the workspace (which is put first on each
+    classpath) instead of next to their sources, and the assessment runner writes its results there.
+    """
+
+    @staticmethod
+    def name() -> str:
+        return "jh61b.scratch"
+
+    @classmethod
+    def display_name(cls, config: ScratchConfig) -> str:
+        return "Scratch Workspace"
+
+    @classmethod
+    def run(cls, bsagio: BSAGIO, config: ScratchConfig) -> bool:
+        if scratch_workspace(bsagio) is not None:
+            return True
+        parent = config.scratch_dir
+        if parent is None and RAM_DIR.is_dir() and os.access(RAM_DIR, os.W_OK):
+            parent = RAM_DIR
+        workspace = ScratchWorkspace(parent)
+        bsagio.data[SCRATCH_KEY] = workspace
+        bsagio.private.debug(f"Scratch workspace at {workspace.root}")
+        return True